@@ -1,111 +1,416 @@
 # app/analysis/code_analyzer.py
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import ast
+import asyncio
+import atexit
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
+import re
+import sqlite3
+import sys
+import threading
 from pathlib import Path
 
-from radon.complexity import cc_visit
-from radon.metrics import mi_visit
+from radon.metrics import h_visit_ast, mi_compute
 from radon.raw import analyze
+from radon.visitors import ComplexityVisitor
 
 from app.analysis.base import BaseAnalyzer
 
 
 logger = logging.getLogger(__name__)
 
+CACHE_FILENAME = '.debt_cache.sqlite3'
+# 分析逻辑或输出字段变化时递增，旧缓存会被整体丢弃
+CACHE_VERSION = 2
+# 待分析文件少于该数量时不启动进程池，避免进程创建开销
+PARALLEL_MIN_FILES = 32
+# 读取队列上限，限制已读入内存但尚未解析的文件数量
+READ_QUEUE_SIZE = 32
+# 参与分析的扩展名（不含点）与遍历时跳过的目录
+SOURCE_EXTENSIONS = frozenset({
+    'py', 'js', 'jsx', 'ts', 'tsx', 'java', 'go', 'cpp', 'c', 'map', 'json', 'css', 'html'
+})
+SKIP_DIRS = frozenset({
+    '.git', '.hg', '.svn', 'node_modules', '.venv', 'venv', '__pycache__', 'dist', 'build'
+})
+# 样本中保留的复杂条件表达式数量，仅这些条目会还原源码文本
+CONDITIONAL_SAMPLE_LIMIT = 10
+# 压缩产物判定：前 MINIFIED_PROBE_CHARS 个字符内没有换行且总长度超过 MINIFIED_MIN_CHARS，
+# 或 JSON/source map 超过 BULK_JSON_CHARS
+MINIFIED_PROBE_CHARS = 2000
+MINIFIED_MIN_CHARS = 50000
+BULK_JSON_CHARS = 200000
+# 注释行：去掉前导空白后以 //、/*、*、--、#、<!-- 开头
+_COMMENT_RE = re.compile(r'\s*(?://|/\*|\*|--|#|<!--)')
+
+
+@dataclass(slots=True)
+class FileMetrics:
+    """单文件分析结果，字段顺序即序列化后的键顺序"""
+    relative_path: str
+    absolute_path: str
+    language: str
+    avg_complexity: float
+    max_complexity: float
+    maintainability_index: float
+    lines_of_code: int
+    logical_lines: int
+    comment_density: float
+    function_count: int
+    smell_score: float
+    smell_flags: List[str]
+    smell_samples: Dict[str, Any]
+    longest_line: int
+    long_line_count: int
+    long_function_count: int
+    high_complexity_blocks: List[Dict]
+    max_nesting_depth: int
+    deeply_nested_functions: List[Dict]
+    long_parameter_functions: List[Dict]
+    complex_conditionals: List[Dict]
+    uninformative_identifiers: List[Dict]
+
+
+class _MetricsCache:
+    """按 (绝对路径, 内容 sha256) 缓存单文件分析结果，未变化的文件无需重新解析"""
+
+    def __init__(self, project_root: Path):
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[tuple] = []
+        try:
+            conn = sqlite3.connect(str(project_root / CACHE_FILENAME), check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+                conn.execute('DROP TABLE IF EXISTS cache')
+                conn.execute(f'PRAGMA user_version={CACHE_VERSION}')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'path TEXT, sha TEXT, json BLOB, PRIMARY KEY (path, sha))'
+            )
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as exc:
+            logger.warning("Metrics cache disabled for %s: %s", project_root, exc)
+
+    def get(self, path: str, sha: str) -> Optional[FileMetrics]:
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                'SELECT json FROM cache WHERE path = ? AND sha = ?', (path, sha)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        try:
+            return FileMetrics(**json.loads(row[0]))
+        except (TypeError, ValueError):
+            return None
+
+    def put(self, path: str, sha: str, metrics: FileMetrics) -> None:
+        if self._conn is None:
+            return
+        try:
+            payload = json.dumps(asdict(metrics), ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        self._pending.append((path, sha, payload))
+
+    def close(self) -> None:
+        """在单个事务中写入本轮新增结果，并清理同一路径的过期记录"""
+        if self._conn is None:
+            return
+        try:
+            if self._pending:
+                with self._conn:
+                    self._conn.executemany(
+                        'DELETE FROM cache WHERE path = ? AND sha <> ?',
+                        [(path, sha) for path, sha, _ in self._pending],
+                    )
+                    self._conn.executemany(
+                        'INSERT OR REPLACE INTO cache (path, sha, json) VALUES (?, ?, ?)',
+                        self._pending,
+                    )
+        except sqlite3.Error as exc:
+            logger.warning("Failed to persist metrics cache: %s", exc)
+        finally:
+            self._pending = []
+            self._conn.close()
+            self._conn = None
+
+
+def _intern_metrics(metrics: FileMetrics) -> FileMetrics:
+    """经进程池反序列化或从缓存读出的结果每个文件都持有独立的字符串副本，
+    对取值集合很小的语言与异味标记做驻留，让所有文件共享同一对象"""
+    metrics.language = sys.intern(metrics.language)
+    metrics.smell_flags = [sys.intern(flag) for flag in metrics.smell_flags]
+    return metrics
+
+
+# 进程内共享的解析进程池，首次需要时创建，跨 analyze() 调用复用，进程退出时关闭
+_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+_PROCESS_POOL_LOCK = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is None:
+            # uvicorn / Celery 进程是多线程的，fork 会把其他线程持有的锁带进子进程；改用 forkserver（不支持时 spawn）
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _PROCESS_POOL = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(method),
+            )
+        return _PROCESS_POOL
+
+
+def _discard_process_pool(pool: ProcessPoolExecutor) -> None:
+    """进程池损坏时丢弃，下次调用重新创建"""
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is pool:
+            _PROCESS_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_process_pool() -> None:
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        pool, _PROCESS_POOL = _PROCESS_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+@lru_cache(maxsize=256)
+def _language_for_suffixes(tail: str) -> str:
+    """按文件名中首个点之后的部分（已转小写）判断语言，同类扩展名大量重复，结果可缓存"""
+    suffixes = ['.' + suffix for suffix in tail.split('.')] if tail else []
+    if not suffixes:
+        return 'text'
+    if suffixes[-1] == '.py' or '.py' in suffixes:
+        return 'python'
+    if suffixes[-1] == '.tsx':
+        return 'tsx'
+    if suffixes[-1] == '.ts':
+        return 'typescript'
+    if suffixes[-1] == '.jsx':
+        return 'jsx'
+    if suffixes[-1] == '.js':
+        return 'javascript'
+    if suffixes[-1] == '.map' and len(suffixes) > 1 and suffixes[-2] in {'.js', '.ts'}:
+        return 'javascript-map'
+    if suffixes[-1] == '.json':
+        return 'json'
+    if suffixes[-1] == '.css':
+        return 'css'
+    if suffixes[-1] == '.html':
+        return 'html'
+    if suffixes[-1] in {'.java', '.go', '.cpp', '.c'}:
+        return suffixes[-1].lstrip('.')
+    return suffixes[-1].lstrip('.')
+
 
 class CodeComplexityAnalyzer(BaseAnalyzer):
     """代码复杂度分析器，支持 Python 及通用文本文件的静态信号"""
 
-    async def analyze(self, project_path: str, project_root: Optional[str] = None, **_: Dict) -> Dict:
-        complexity_data: Dict[str, Dict] = {}
+    async def analyze(self, project_path: str, project_root: Optional[str] = None,
+                      **_: Dict) -> Dict[str, FileMetrics]:
         project_root_path = self._determine_project_root(project_path, project_root)
-
-        for file_path in self._find_source_files(project_path):
+        files = await asyncio.to_thread(list, self._find_source_files(project_path))
+
+        worker_count = os.cpu_count() or 1
+        # Celery prefork 等守护进程内无法再创建子进程，此时退回默认线程池
+        use_processes = len(files) >= PARALLEL_MIN_FILES and not multiprocessing.current_process().daemon
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=READ_QUEUE_SIZE)
+        # 按发现顺序存放结果，保证输出顺序稳定
+        results: List[Optional[Tuple[str, FileMetrics]]] = [None] * len(files)
+        cache = await asyncio.to_thread(_MetricsCache, project_root_path)
+
+        async def produce() -> None:
+            # 读盘与哈希在线程中进行，与解析重叠
+            for idx, file_path in enumerate(files):
+                item = await asyncio.to_thread(self._read_source, file_path, project_root_path)
+                if item is not None:
+                    await queue.put((idx, item))
+            for _ in range(worker_count):
+                await queue.put(None)
+
+        async def run_analysis(abs_path: str, rel_path: str, data: bytes) -> Optional[FileMetrics]:
+            nonlocal use_processes
+            executor = _get_process_pool() if use_processes else None
             try:
-                abs_path = Path(file_path).resolve()
-                rel_path = self._to_relative_path(abs_path, project_root_path)
-
-                with open(abs_path, 'r', encoding='utf-8') as f:
-                    source_code = f.read()
-
-                language_hint = self._detect_language(abs_path)
-
-                if language_hint == 'python':
-                    complexity_results = cc_visit(source_code)
-                    avg_complexity = self._calculate_avg_complexity(complexity_results)
-                    max_complexity = max((result.complexity for result in complexity_results), default=0.0)
-
-                    maintainability_index = self._extract_maintainability(mi_visit(source_code, multi=True))
-
-                    raw_metrics = analyze(source_code)
-                    comment_density = raw_metrics.comments / raw_metrics.loc if raw_metrics.loc > 0 else 0.0
-                    smell_info = self._detect_code_smells(source_code, complexity_results)
-
-                    complexity_data[rel_path] = {
-                        'relative_path': rel_path,
-                        'absolute_path': str(abs_path),
-                        'language': language_hint,
-                        'avg_complexity': avg_complexity,
-                        'max_complexity': max_complexity,
-                        'maintainability_index': maintainability_index,
-                        'lines_of_code': raw_metrics.loc,
-                        'logical_lines': raw_metrics.lloc,
-                        'comment_density': comment_density,
-                        'function_count': len(complexity_results),
-                        'smell_score': smell_info['smell_score'],
-                        'smell_flags': smell_info['smell_flags'],
-                        'smell_samples': smell_info['samples'],
-                        'longest_line': smell_info['longest_line'],
-                        'long_line_count': smell_info['long_line_count'],
-                        'long_function_count': smell_info['long_function_count'],
-                        'high_complexity_blocks': smell_info['high_complexity_blocks'],
-                        'max_nesting_depth': smell_info['max_nesting_depth'],
-                        'deeply_nested_functions': smell_info['deeply_nested_functions'],
-                        'long_parameter_functions': smell_info['long_parameter_functions'],
-                        'complex_conditionals': smell_info['complex_conditionals'],
-                        'uninformative_identifiers': smell_info['uninformative_identifiers'],
-                    }
-                else:
-                    complexity_data[rel_path] = self._analyze_non_python(
-                        source_code, abs_path, rel_path, language_hint
-                    )
+                return await loop.run_in_executor(executor, _analyze_one, abs_path, rel_path, data)
+            except (OSError, BrokenProcessPool) as exc:
+                if executor is None:
+                    raise
+                logger.warning("Process pool unavailable, analyzing in threads: %s", exc)
+                use_processes = False
+                _discard_process_pool(executor)
+                return await loop.run_in_executor(None, _analyze_one, abs_path, rel_path, data)
+
+        async def consume() -> None:
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                idx, (abs_path, rel_path, data, digest) = entry
+                try:
+                    metrics = cache.get(abs_path, digest)
+                    if metrics is None:
+                        metrics = await run_analysis(abs_path, rel_path, data)
+                        if metrics is None:
+                            continue
+                        cache.put(abs_path, digest, metrics)
+                    results[idx] = (rel_path, _intern_metrics(metrics))
+                except Exception:
+                    logger.exception("Error analyzing %s", abs_path)
+
+        try:
+            await asyncio.gather(produce(), *(consume() for _ in range(worker_count)))
+        finally:
+            await asyncio.to_thread(cache.close)
 
-            except Exception:
-                logger.exception("Error analyzing %s", file_path)
-                continue
+        return {rel_path: metrics for rel_path, metrics in filter(None, results)}
 
-        return complexity_data
+    def _read_source(self, file_path: str, project_root_path: Path) -> Optional[Tuple[str, str, bytes, str]]:
+        """读取文件内容，返回 (绝对路径, 相对路径, 字节内容, sha256)"""
+        try:
+            # 路径来自 _find_source_files，已是规范绝对路径（见其说明），不再 resolve
+            abs_path = Path(file_path)
+            rel_path = self._to_relative_path(abs_path, project_root_path)
+            with open(abs_path, 'rb') as f:
+                data = f.read()
+        except Exception:
+            logger.exception("Error analyzing %s", file_path)
+            return None
+        return str(abs_path), rel_path, data, hashlib.sha256(data).hexdigest()
+
+    def _analyze_source(self, file_path: str, rel_path: str, data: bytes) -> Optional[FileMetrics]:
+        """分析单个文件的内容，失败时返回 None"""
+        try:
+            abs_path = Path(file_path)
+            source_code = self._decode_source(data)
+            language_hint = self._detect_language(abs_path)
+
+            if language_hint == 'python':
+                # 只解析一次，语法树与 raw 指标在 radon 各项指标及异味检测间共享
+                tree = ast.parse(source_code)
+                complexity_visitor = ComplexityVisitor.from_ast(tree)
+                complexity_results = complexity_visitor.blocks
+                avg_complexity = self._calculate_avg_complexity(complexity_results)
+                max_complexity = max((result.complexity for result in complexity_results), default=0.0)
+
+                raw_metrics = analyze(source_code)
+                maintainability_index = self._extract_maintainability(
+                    self._compute_maintainability(tree, raw_metrics, complexity_visitor)
+                )
+
+                comment_density = raw_metrics.comments / raw_metrics.loc if raw_metrics.loc > 0 else 0.0
+                smell_info = self._detect_code_smells(source_code, complexity_results, tree=tree)
+
+                metrics = FileMetrics(
+                    relative_path=rel_path,
+                    absolute_path=str(abs_path),
+                    language=language_hint,
+                    avg_complexity=avg_complexity,
+                    max_complexity=max_complexity,
+                    maintainability_index=maintainability_index,
+                    lines_of_code=raw_metrics.loc,
+                    logical_lines=raw_metrics.lloc,
+                    comment_density=comment_density,
+                    function_count=len(complexity_results),
+                    smell_score=smell_info['smell_score'],
+                    smell_flags=smell_info['smell_flags'],
+                    smell_samples=smell_info['samples'],
+                    longest_line=smell_info['longest_line'],
+                    long_line_count=smell_info['long_line_count'],
+                    long_function_count=smell_info['long_function_count'],
+                    high_complexity_blocks=smell_info['high_complexity_blocks'],
+                    max_nesting_depth=smell_info['max_nesting_depth'],
+                    deeply_nested_functions=smell_info['deeply_nested_functions'],
+                    long_parameter_functions=smell_info['long_parameter_functions'],
+                    complex_conditionals=smell_info['complex_conditionals'],
+                    uninformative_identifiers=smell_info['uninformative_identifiers'],
+                )
+            else:
+                metrics = self._analyze_non_python(source_code, abs_path, rel_path, language_hint)
+
+            return metrics
+
+        except Exception:
+            logger.exception("Error analyzing %s", file_path)
+            return None
+
+    def _compute_maintainability(self, tree: ast.AST, raw_metrics, complexity_visitor: ComplexityVisitor) -> float:
+        """等价于 mi_visit(source_code, multi=True)，复用已有的语法树与 raw 指标"""
+        comment_lines = raw_metrics.comments + raw_metrics.multi
+        comments = comment_lines / float(raw_metrics.sloc) * 100 if raw_metrics.sloc != 0 else 0
+        return mi_compute(
+            h_visit_ast(tree).total.volume,
+            complexity_visitor.total_complexity,
+            raw_metrics.lloc,
+            comments,
+        )
 
-    def _find_source_files(self, project_path: str) -> List[str]:
-        src_files: List[str] = []
-        p = Path(project_path)
+    def _decode_source(self, data: bytes) -> str:
+        # 与文本模式读取保持一致：严格 UTF-8 解码并统一换行符；
+        # \r 不会出现在 UTF-8 多字节序列中，可直接在字节上替换，避免再复制一份字符串
+        if b'\r' in data:
+            data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        return data.decode('utf-8')
 
-        if p.is_file():
-            return [str(p)]
+    def _find_source_files(self, project_path: str) -> Iterator[str]:
+        """以生成器方式逐个产出待分析文件，顺序与 os.walk 自顶向下遍历一致。
 
-        exts = {
-            '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.go', '.cpp', '.c', '.map', '.json', '.css', '.html'
-        }
-        skip_dirs = {
-            '.git', '.hg', '.svn', 'node_modules', '.venv', 'venv', '__pycache__', 'dist', 'build'
-        }
+        只对遍历根做一次 realpath；遍历不进入符号链接目录，产出的路径因此已是规范绝对路径，
+        读取时无需再逐个 resolve。
+        """
+        root = os.path.realpath(project_path)
 
-        for root, dirs, files in os.walk(p):
-            dirs[:] = [d for d in dirs if d not in skip_dirs]
-            for fname in files:
-                file_path = Path(root) / fname
-                suffixes = [s.lower() for s in file_path.suffixes]
-                if not suffixes:
-                    continue
-                last = suffixes[-1]
-                second_last = suffixes[-2] if len(suffixes) > 1 else ''
-                if last in exts:
-                    src_files.append(str(file_path))
-                elif last == '.map' and second_last in {'.js', '.ts'}:
-                    src_files.append(str(file_path))
-        return src_files
+        if os.path.isfile(root):
+            yield root
+            return
+
+        def walk(directory: str) -> Iterator[str]:
+            subdirs: List[str] = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if is_dir:
+                            # 与 os.walk(followlinks=False) 一致：不进入符号链接目录
+                            if entry.name not in SKIP_DIRS and not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+
+                        # .js.map/.ts.map 的末尾后缀同样是 map，只需判断最后一个后缀
+                        stem = entry.name.lstrip('.')
+                        dot = stem.rfind('.')
+                        if dot >= 0 and stem[dot + 1:].lower() in SOURCE_EXTENSIONS:
+                            yield entry.path
+            except OSError:
+                return
+            for subdir in subdirs:
+                yield from walk(subdir)
+
+        yield from walk(root)
 
     def _determine_project_root(self, project_path: str, project_root: Optional[str]) -> Path:
         if project_root:
@@ -126,11 +431,6 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
     def _extract_maintainability(self, value) -> float:
         if value is None:
             return 100.0
-        if isinstance(value, (list, tuple)):
-            values = [float(v) for v in value if v is not None]
-            if not values:
-                return 100.0
-            return sum(values) / len(values)
         try:
             return float(value)
         except (TypeError, ValueError):
@@ -141,13 +441,27 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
             return 0.0
         return sum(result.complexity for result in complexity_results) / len(complexity_results)
 
-    def _detect_code_smells(self, source_code: str, complexity_results: List) -> Dict:
-        lines = source_code.splitlines()
+    def _detect_code_smells(self, source_code: str, complexity_results: List,
+                            lines: Optional[List[str]] = None, tree: Optional[ast.AST] = None,
+                            parse_ast: bool = True) -> Dict:
+        if lines is None:
+            lines = source_code.splitlines()
+        if tree is None and parse_ast:
+            try:
+                tree = ast.parse(source_code)
+            except SyntaxError:
+                pass
         long_line_threshold = 120
         extreme_line_threshold = 180
-        long_lines = [(idx + 1, len(line)) for idx, line in enumerate(lines) if len(line) > long_line_threshold]
-        longest_line = max((len(line) for line in lines), default=0)
-        line_count = len(lines)
+
+        # 行长度由 map(len) 在 C 层一次求出；只有存在超长行时才逐行收集样本
+        line_lengths = list(map(len, lines))
+        line_count = len(line_lengths)
+        longest_line = max(line_lengths, default=0)
+        long_lines = (
+            [(idx, length) for idx, length in enumerate(line_lengths, 1) if length > long_line_threshold]
+            if longest_line > long_line_threshold else []
+        )
 
         high_complexity_blocks = []
         long_functions = []
@@ -174,7 +488,7 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
                     'end_line': end_line,
                 })
 
-        ast_metrics = self._analyze_ast_smells(source_code)
+        ast_metrics = self._analyze_ast_smells(tree)
 
         smell_flags: List[str] = []
         if longest_line >= extreme_line_threshold:
@@ -223,7 +537,7 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
             'high_complexity_blocks': high_complexity_blocks[:5],
             'deeply_nested_functions': ast_metrics['deeply_nested_functions'][:5],
             'long_parameter_functions': ast_metrics['long_parameter_functions'][:5],
-            'complex_conditionals': ast_metrics['complex_conditionals'][:10],
+            'complex_conditionals': ast_metrics['complex_conditionals'][:CONDITIONAL_SAMPLE_LIMIT],
             'uninformative_identifiers': ast_metrics['uninformative_identifiers'][:10],
         }
 
@@ -243,10 +557,8 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
             'is_minified_candidate': minified_candidate,
         }
 
-    def _analyze_ast_smells(self, source_code: str) -> Dict:
-        try:
-            tree = ast.parse(source_code)
-        except SyntaxError:
+    def _analyze_ast_smells(self, tree: Optional[ast.AST]) -> Dict:
+        if tree is None:
             return {
                 'max_nesting_depth': 0,
                 'deeply_nested_functions': [],
@@ -257,11 +569,10 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
 
         control_nodes = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With)
 
-        long_param_functions: List[Dict] = []
-        deeply_nested_functions: List[Dict] = []
         complex_conditionals: List[Dict] = []
         uninformative_identifiers: List[Dict] = []
-        max_nesting_depth = 0
+        # 每个函数一条记录：[树深度, 节点, 参数个数, 函数内最大嵌套深度]
+        function_records: List[list] = []
 
         def count_params(func: ast.AST) -> int:
             args = func.args
@@ -270,75 +581,85 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
             count += 1 if args.kwarg else 0
             return count
 
-        def nesting_depth(node: ast.AST, depth: int = 0) -> int:
-            current_max = depth
-            for child in ast.iter_child_nodes(node):
-                if isinstance(child, control_nodes):
-                    child_depth = nesting_depth(child, depth + 1)
-                else:
-                    child_depth = nesting_depth(child, depth)
-                if child_depth > current_max:
-                    current_max = child_depth
-            return current_max
-
-        class ConditionalVisitor(ast.NodeVisitor):
-            def visit_BoolOp(self, node: ast.BoolOp):
-                if len(node.values) >= 3:
-                    complex_conditionals.append({
-                        'line': getattr(node, 'lineno', None),
-                        'elements': len(node.values),
-                        'text': ast.unparse(node) if hasattr(ast, 'unparse') else None,
-                    })
+        class SmellVisitor(ast.NodeVisitor):
+            """单次遍历同时收集条件表达式、标识符、参数个数与嵌套深度"""
+
+            def __init__(self):
+                self.level = 0  # 当前节点在语法树中的深度
+                self.depth = 0  # 当前所处的控制结构嵌套层数
+                self.frames: List[list] = []  # 函数栈：[进入时的 depth, 见到的最大 depth]
+                self.ident_total = 0  # 标识符长度累计，仅用于求平均长度
+                self.ident_count = 0
+
+            def record_identifier(self, name: str, line: Optional[int]) -> None:
+                self.ident_total += len(name)
+                self.ident_count += 1
+                if len(name) <= 2:
+                    uninformative_identifiers.append({'name': name, 'line': line})
+
+            def generic_visit(self, node: ast.AST):
+                is_control = isinstance(node, control_nodes)
+                if is_control:
+                    self.depth += 1
+                    if self.frames and self.depth > self.frames[-1][1]:
+                        self.frames[-1][1] = self.depth
+                self.level += 1
+                super().generic_visit(node)
+                self.level -= 1
+                if is_control:
+                    self.depth -= 1
+
+            def visit_function(self, node):
+                self.record_identifier(node.name, getattr(node, 'lineno', None))
+                record = [self.level, node, count_params(node), 0]
+                function_records.append(record)
+
+                self.frames.append([self.depth, self.depth])
                 self.generic_visit(node)
+                base, deepest = self.frames.pop()
+                record[3] = deepest - base
+                # 嵌套函数的深度同样计入外层函数
+                if self.frames and deepest > self.frames[-1][1]:
+                    self.frames[-1][1] = deepest
 
-        cond_visitor = ConditionalVisitor()
-        cond_visitor.visit(tree)
+            visit_FunctionDef = visit_function
+            visit_AsyncFunctionDef = visit_function
 
-        identifier_lengths: List[int] = []
+            def visit_ClassDef(self, node: ast.ClassDef):
+                self.record_identifier(node.name, getattr(node, 'lineno', None))
+                self.generic_visit(node)
 
-        class IdentifierVisitor(ast.NodeVisitor):
             def visit_Name(self, node: ast.Name):
                 ident = node.id
                 if ident and ident not in {'self', 'cls'}:
-                    identifier_lengths.append(len(ident))
-                    if len(ident) <= 2:
-                        uninformative_identifiers.append({
-                            'name': ident,
-                            'line': getattr(node, 'lineno', None),
-                        })
+                    self.record_identifier(ident, getattr(node, 'lineno', None))
                 self.generic_visit(node)
 
-            def visit_FunctionDef(self, node: ast.FunctionDef):
-                identifier_lengths.append(len(node.name))
-                if len(node.name) <= 2:
-                    uninformative_identifiers.append({
-                        'name': node.name,
+            def visit_BoolOp(self, node: ast.BoolOp):
+                if len(node.values) >= 3:
+                    complex_conditionals.append({
                         'line': getattr(node, 'lineno', None),
+                        'elements': len(node.values),
+                        '_node': node,
                     })
                 self.generic_visit(node)
 
-            def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
-                identifier_lengths.append(len(node.name))
-                if len(node.name) <= 2:
-                    uninformative_identifiers.append({
-                        'name': node.name,
-                        'line': getattr(node, 'lineno', None),
-                    })
-                self.generic_visit(node)
+        visitor = SmellVisitor()
+        visitor.visit(tree)
 
-            def visit_ClassDef(self, node: ast.ClassDef):
-                identifier_lengths.append(len(node.name))
-                if len(node.name) <= 2:
-                    uninformative_identifiers.append({
-                        'name': node.name,
-                        'line': getattr(node, 'lineno', None),
-                    })
-                self.generic_visit(node)
+        # 只为会进入样本的前几条条件表达式还原源码文本
+        can_unparse = hasattr(ast, 'unparse')
+        for idx, entry in enumerate(complex_conditionals):
+            node = entry.pop('_node')
+            entry['text'] = ast.unparse(node) if can_unparse and idx < CONDITIONAL_SAMPLE_LIMIT else None
 
-        IdentifierVisitor().visit(tree)
+        long_param_functions: List[Dict] = []
+        deeply_nested_functions: List[Dict] = []
+        max_nesting_depth = 0
 
-        for func in [n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]:
-            params = count_params(func)
+        # 按树深度稳定排序，与 ast.walk 的广度优先顺序一致
+        function_records.sort(key=lambda record: record[0])
+        for _, func, params, depth in function_records:
             if params > 6:
                 long_param_functions.append({
                     'name': func.name,
@@ -346,7 +667,6 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
                     'line': getattr(func, 'lineno', None),
                 })
 
-            depth = nesting_depth(func)
             if depth > max_nesting_depth:
                 max_nesting_depth = depth
             if depth >= 4:
@@ -357,8 +677,8 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
                 })
 
         avg_identifier_length = (
-            sum(identifier_lengths) / len(identifier_lengths)
-            if identifier_lengths else None
+            visitor.ident_total / visitor.ident_count
+            if visitor.ident_count else None
         )
         if avg_identifier_length is not None and avg_identifier_length < 3:
             if not uninformative_identifiers:
@@ -373,40 +693,23 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
         }
 
     def _detect_language(self, path: Path) -> str:
-        suffixes = [s.lower() for s in path.suffixes]
-        if not suffixes:
-            return 'text'
-        if suffixes[-1] == '.py' or '.py' in suffixes:
-            return 'python'
-        if suffixes[-1] == '.tsx':
-            return 'tsx'
-        if suffixes[-1] == '.ts':
-            return 'typescript'
-        if suffixes[-1] == '.jsx':
-            return 'jsx'
-        if suffixes[-1] == '.js':
-            return 'javascript'
-        if suffixes[-1] == '.map' and len(suffixes) > 1 and suffixes[-2] in {'.js', '.ts'}:
-            return 'javascript-map'
-        if suffixes[-1] == '.json':
-            return 'json'
-        if suffixes[-1] == '.css':
-            return 'css'
-        if suffixes[-1] == '.html':
-            return 'html'
-        if suffixes[-1] in {'.java', '.go', '.cpp', '.c'}:
-            return suffixes[-1].lstrip('.')
-        return suffixes[-1].lstrip('.')
-
-    def _analyze_non_python(self, source_code: str, abs_path: Path, rel_path: str, language: str) -> Dict:
-        lines = source_code.splitlines() or ['']
+        # 与 Path.suffixes 规则一致：以点结尾的文件名没有后缀，前导点不计入后缀
+        name = path.name
+        tail = '' if name.endswith('.') else name.lstrip('.').partition('.')[2]
+        return _language_for_suffixes(tail.lower())
+
+    def _analyze_non_python(self, source_code: str, abs_path: Path, rel_path: str, language: str) -> FileMetrics:
+        split_lines = source_code.splitlines()
+        lines = split_lines or ['']
         loc = len(lines)
         non_empty = sum(1 for line in lines if line.strip())
-        comment_markers = ('//', '/*', '*', '--', '#', '/*!', '//!', '<!--')
-        comment_lines = sum(1 for line in lines if line.strip().startswith(comment_markers))
+        comment_lines = sum(1 for line in lines if _COMMENT_RE.match(line))
         comment_density = comment_lines / loc if loc else 0.0
 
-        smell_info = self._detect_code_smells(source_code, [])
+        # 压缩产物与大体积 JSON/source map 不会产生语法树异味，跳过 ast.parse 与遍历
+        smell_info = self._detect_code_smells(
+            source_code, [], split_lines, parse_ast=not self._is_bulk_asset(source_code, language)
+        )
         longest_line = smell_info['longest_line']
         smell_flags = list(dict.fromkeys(smell_info['smell_flags']))
         smell_score = smell_info['smell_score']
@@ -418,30 +721,37 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
 
         estimated_maintainability = self._estimate_non_python_maintainability(loc, longest_line, bool(is_minified))
 
-        return {
-            'relative_path': rel_path,
-            'absolute_path': str(abs_path),
-            'language': language,
-            'avg_complexity': 0.0,
-            'max_complexity': 0.0,
-            'maintainability_index': estimated_maintainability,
-            'lines_of_code': loc,
-            'logical_lines': non_empty,
-            'comment_density': comment_density,
-            'function_count': 0,
-            'smell_score': smell_score,
-            'smell_flags': smell_flags,
-            'smell_samples': smell_info['samples'],
-            'longest_line': longest_line,
-            'long_line_count': smell_info['long_line_count'],
-            'long_function_count': 0,
-            'high_complexity_blocks': [],
-            'max_nesting_depth': smell_info['max_nesting_depth'],
-            'deeply_nested_functions': smell_info['deeply_nested_functions'],
-            'long_parameter_functions': smell_info['long_parameter_functions'],
-            'complex_conditionals': smell_info['complex_conditionals'],
-            'uninformative_identifiers': smell_info['uninformative_identifiers'],
-        }
+        return FileMetrics(
+            relative_path=rel_path,
+            absolute_path=str(abs_path),
+            language=language,
+            avg_complexity=0.0,
+            max_complexity=0.0,
+            maintainability_index=estimated_maintainability,
+            lines_of_code=loc,
+            logical_lines=non_empty,
+            comment_density=comment_density,
+            function_count=0,
+            smell_score=smell_score,
+            smell_flags=smell_flags,
+            smell_samples=smell_info['samples'],
+            longest_line=longest_line,
+            long_line_count=smell_info['long_line_count'],
+            long_function_count=0,
+            high_complexity_blocks=[],
+            max_nesting_depth=smell_info['max_nesting_depth'],
+            deeply_nested_functions=smell_info['deeply_nested_functions'],
+            long_parameter_functions=smell_info['long_parameter_functions'],
+            complex_conditionals=smell_info['complex_conditionals'],
+            uninformative_identifiers=smell_info['uninformative_identifiers'],
+        )
+
+    def _is_bulk_asset(self, source_code: str, language: str) -> bool:
+        """根据体积与首段换行数快速判断压缩/生成产物"""
+        total_len = len(source_code)
+        if language in {'javascript-map', 'json'} and total_len > BULK_JSON_CHARS:
+            return True
+        return total_len > MINIFIED_MIN_CHARS and source_code.count('\n', 0, MINIFIED_PROBE_CHARS) == 0
 
     def _estimate_non_python_maintainability(self, loc: int, longest_line: int, minified: bool) -> float:
         base = 100.0
@@ -450,3 +760,14 @@ class CodeComplexityAnalyzer(BaseAnalyzer):
         if minified:
             base = min(base, 12.0)
         return max(5.0, base)
+
+
+_worker_analyzer: Optional[CodeComplexityAnalyzer] = None
+
+
+def _analyze_one(file_path: str, rel_path: str, data: bytes) -> Optional[FileMetrics]:
+    """执行器入口：每个工作进程复用一个分析器实例"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = CodeComplexityAnalyzer()
+    return _worker_analyzer._analyze_source(file_path, rel_path, data)
@@ -1,6 +1,14 @@
 # app/analysis/debt_calculator.py
-from math import ceil
-from typing import Dict, List
+from dataclasses import asdict
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from app.analysis.code_analyzer import FileMetrics
+
+# 严重程度阈值（升序）及对应等级：score >= 0.25 为 critical，>= 0.15 为 high，>= 0.05 为 medium
+SEVERITY_THRESHOLDS = np.array([0.05, 0.15, 0.25])
+SEVERITY_LEVELS = np.array(['low', 'medium', 'high', 'critical'], dtype=object)
 
 
 class TechnicalDebtCalculator:
@@ -9,129 +17,131 @@ class TechnicalDebtCalculator:
     def calculate_debt_score(self, heat_data: Dict, complexity_data: Dict) -> Dict:
         """计算技术债务分数，并提供更精细的风险拆解"""
         debt_scores: Dict[str, Dict] = {}
-        all_files = set(heat_data.keys()) | set(complexity_data.keys())
-
-        for file_path in all_files:
-            heat_metrics = heat_data.get(file_path, {}) or {}
-            complexity_metrics = complexity_data.get(file_path, {}) or {}
-
-            heat_component = self._heat_component(heat_metrics)
-            complexity_component = self._complexity_component(complexity_metrics)
-            maintainability_component = self._maintainability_component(complexity_metrics)
-            size_component = self._size_component(complexity_metrics)
-            comment_component = self._comment_component(complexity_metrics)
-            smell_component = self._smell_component(complexity_metrics)
-
-            debt_score = min(1.0, (
-                heat_component * 0.3
-                + complexity_component * 0.2
-                + maintainability_component * 0.15
-                + size_component * 0.1
-                + comment_component * 0.05
-                + smell_component * 0.2
-            ))
-
-            breakdown = {
-                'heat_component': heat_component,
-                'complexity_component': complexity_component,
-                'maintainability_component': maintainability_component,
-                'size_component': size_component,
-                'comment_component': comment_component,
-                'smell_component': smell_component,
-            }
+        # dict 的 keys 视图直接支持并集，无需先各自构造 set
+        all_files = list(heat_data.keys() | complexity_data.keys())
+        heat_rows: List[Dict] = [heat_data.get(file_path, {}) or {} for file_path in all_files]
+        metric_rows: List[Optional[FileMetrics]] = [complexity_data.get(file_path) for file_path in all_files]
+
+        # 各分量在整个文件矩阵上向量化计算
+        components = {
+            'heat_component': self._heat_component(heat_rows),
+            'complexity_component': self._complexity_component(metric_rows),
+            'maintainability_component': self._maintainability_component(metric_rows),
+            'size_component': self._size_component(metric_rows),
+            'comment_component': self._comment_component(metric_rows),
+            'smell_component': self._smell_component(metric_rows),
+        }
+        debt_array = np.minimum(1.0, (
+            components['heat_component'] * 0.3
+            + components['complexity_component'] * 0.2
+            + components['maintainability_component'] * 0.15
+            + components['size_component'] * 0.1
+            + components['comment_component'] * 0.05
+            + components['smell_component'] * 0.2
+        ))
+
+        debt_values = debt_array.tolist()
+        severities = self._classify_severity(debt_array).tolist()
+        efforts = self._estimate_effort(debt_array, metric_rows).tolist()
+        component_values = {name: values.tolist() for name, values in components.items()}
+
+        for idx, file_path in enumerate(all_files):
+            heat_metrics = heat_rows[idx]
+            complexity_metrics = metric_rows[idx]
+            debt_score = debt_values[idx]
+            breakdown = {name: values[idx] for name, values in component_values.items()}
 
-            severity = self._classify_severity(debt_score)
             debt_scores[file_path] = {
                 'debt_score': debt_score,
-                'severity': severity,
-                'estimated_effort': self._estimate_effort(debt_score, complexity_metrics),
+                'severity': severities[idx],
+                'estimated_effort': efforts[idx],
                 'risk_flags': self._generate_flags(heat_metrics, complexity_metrics, breakdown),
                 'heat_metrics': heat_metrics,
-                'complexity_metrics': complexity_metrics,
+                'complexity_metrics': asdict(complexity_metrics) if complexity_metrics else {},
                 'score_breakdown': breakdown,
-                'smell_flags': complexity_metrics.get('smell_flags', []),
-                'smell_samples': complexity_metrics.get('smell_samples', {}),
+                'smell_flags': complexity_metrics.smell_flags if complexity_metrics else [],
+                'smell_samples': complexity_metrics.smell_samples if complexity_metrics else {},
                 'line': self._derive_focus_line(complexity_metrics),
             }
 
         return debt_scores
 
-    def _heat_component(self, metrics: Dict) -> float:
-        base_score = metrics.get('heat_score', 0.0) or 0.0
-        change_boost = min((metrics.get('change_count', 0) or 0) / 6, 1.0)
-        churn = metrics.get('churn', 0) or 0
-        churn_boost = min(churn / 500, 1.0)
-        return max(base_score, 0.25 * change_boost + 0.75 * base_score + 0.15 * churn_boost)
-
-    def _complexity_component(self, metrics: Dict) -> float:
-        complexity = metrics.get('avg_complexity', 0.0) or 0.0
-        max_complexity = metrics.get('max_complexity', complexity) or complexity
-        # 更关注最高圈复杂度，提升敏感度
-        return min(max_complexity / 8, 1.0)
-
-    def _maintainability_component(self, metrics: Dict) -> float:
-        mi = metrics.get('maintainability_index', 100.0) or 100.0
-        return min(max((100 - mi) / 60, 0.0), 1.0)
-
-    def _size_component(self, metrics: Dict) -> float:
-        loc = metrics.get('lines_of_code', 0) or 0
-        functions = metrics.get('function_count', 0) or 0
-        loc_component = min(loc / 600, 1.0)
-        function_component = min(functions / 30, 1.0)
-        return max(loc_component, function_component)
-
-    def _comment_component(self, metrics: Dict) -> float:
-        density = metrics.get('comment_density', 0.0) or 0.0
+    def _column(self, values: Iterable[float], count: int) -> np.ndarray:
+        return np.fromiter(values, dtype=np.float64, count=count)
+
+    def _heat_component(self, rows: List[Dict]) -> np.ndarray:
+        n = len(rows)
+        base_score = self._column(((row.get('heat_score', 0.0) or 0.0) for row in rows), n)
+        change_count = self._column(((row.get('change_count', 0) or 0) for row in rows), n)
+        churn = self._column(((row.get('churn', 0) or 0) for row in rows), n)
+        change_boost = np.minimum(change_count / 6, 1.0)
+        churn_boost = np.minimum(churn / 500, 1.0)
+        return np.maximum(base_score, 0.25 * change_boost + 0.75 * base_score + 0.15 * churn_boost)
+
+    def _complexity_component(self, rows: List[Optional[FileMetrics]]) -> np.ndarray:
+        # 更关注最高圈复杂度，提升敏感度；缺失时退回平均复杂度
+        max_complexity = self._column(
+            ((m.max_complexity or m.avg_complexity or 0.0) if m else 0.0 for m in rows), len(rows)
+        )
+        return np.minimum(max_complexity / 8, 1.0)
+
+    def _maintainability_component(self, rows: List[Optional[FileMetrics]]) -> np.ndarray:
+        mi = self._column(((m.maintainability_index or 100.0) if m else 100.0 for m in rows), len(rows))
+        return np.minimum(np.maximum((100 - mi) / 60, 0.0), 1.0)
+
+    def _size_component(self, rows: List[Optional[FileMetrics]]) -> np.ndarray:
+        n = len(rows)
+        loc = self._column(((m.lines_of_code or 0) if m else 0 for m in rows), n)
+        functions = self._column(((m.function_count or 0) if m else 0 for m in rows), n)
+        loc_component = np.minimum(loc / 600, 1.0)
+        function_component = np.minimum(functions / 30, 1.0)
+        return np.maximum(loc_component, function_component)
+
+    def _comment_component(self, rows: List[Optional[FileMetrics]]) -> np.ndarray:
+        density = self._column(((m.comment_density or 0.0) if m else 0.0 for m in rows), len(rows))
         # 注释稀缺时增加债务分数
-        if density >= 0.35:
-            return 0.0
-        return min((0.35 - density) / 0.35, 1.0)
-
-    def _smell_component(self, metrics: Dict) -> float:
-        score = metrics.get('smell_score', 0.0) or 0.0
-        penalty = min(len(metrics.get('smell_flags', []) or []) / 4, 1.0)
-        combined = max(score, penalty)
-        longest_line = metrics.get('longest_line', 0) or 0
-        if longest_line >= 220:
-            combined = min(1.0, combined + 0.2)
-        return min(1.0, combined)
-
-    def _classify_severity(self, score: float) -> str:
-        """分类严重程度"""
-        if score >= 0.25:
-            return 'critical'
-        elif score >= 0.15:
-            return 'high'
-        elif score >= 0.05:
-            return 'medium'
-        return 'low'
-
-    def _estimate_effort(self, score: float, metrics: Dict) -> int:
+        return np.where(density >= 0.35, 0.0, np.minimum((0.35 - density) / 0.35, 1.0))
+
+    def _smell_component(self, rows: List[Optional[FileMetrics]]) -> np.ndarray:
+        n = len(rows)
+        score = self._column(((m.smell_score or 0.0) if m else 0.0 for m in rows), n)
+        flag_count = self._column((len(m.smell_flags or []) if m else 0 for m in rows), n)
+        longest_line = self._column(((m.longest_line or 0) if m else 0 for m in rows), n)
+        combined = np.maximum(score, np.minimum(flag_count / 4, 1.0))
+        combined = np.where(longest_line >= 220, np.minimum(1.0, combined + 0.2), combined)
+        return np.minimum(1.0, combined)
+
+    def _classify_severity(self, scores: np.ndarray) -> np.ndarray:
+        """分类严重程度：分数不低于某个阈值即落入对应等级"""
+        return SEVERITY_LEVELS[np.searchsorted(SEVERITY_THRESHOLDS, scores, side='right')]
+
+    def _estimate_effort(self, scores: np.ndarray, rows: List[Optional[FileMetrics]]) -> np.ndarray:
         """估算修复工作量（小时）"""
-        loc = metrics.get('lines_of_code', 0) or 0
-        complexity = metrics.get('avg_complexity', 0.0) or 0.0
-        base = 2 + score * 10
+        n = len(rows)
+        loc = self._column(((m.lines_of_code or 0) if m else 0 for m in rows), n)
+        complexity = self._column(((m.avg_complexity or 0.0) if m else 0.0 for m in rows), n)
+        base = 2 + scores * 10
         loc_bonus = loc / 250
         complexity_bonus = complexity / 2
-        return max(1, ceil(base + loc_bonus + complexity_bonus))
+        return np.maximum(1, np.ceil(base + loc_bonus + complexity_bonus)).astype(np.int64)
 
-    def _generate_flags(self, heat: Dict, complexity: Dict, breakdown: Dict) -> List[str]:
+    def _generate_flags(self, heat: Dict, complexity: Optional[FileMetrics], breakdown: Dict) -> List[str]:
         flags: List[str] = []
 
         if breakdown['heat_component'] > 0.6:
             flags.append('Frequent changes / high churn')
         if breakdown['complexity_component'] > 0.6:
             flags.append('High cyclomatic complexity')
-        if complexity.get('maintainability_index', 100) < 65:
+        if complexity is not None and complexity.maintainability_index < 65:
             flags.append('Low maintainability index')
-        if complexity.get('lines_of_code', 0) > 800:
+        if complexity is not None and complexity.lines_of_code > 800:
             flags.append('Large file size')
         if breakdown['comment_component'] > 0.5:
             flags.append('Low comment coverage')
         if breakdown['smell_component'] > 0.5:
             flags.append('Code smell indicators present')
 
-        for flag in complexity.get('smell_flags', []) or []:
+        for flag in (complexity.smell_flags if complexity else None) or []:
             if flag not in flags:
                 flags.append(flag)
 
@@ -141,11 +151,15 @@ class TechnicalDebtCalculator:
 
         return flags
 
-    def _derive_focus_line(self, metrics: Dict) -> int | None:
+    def _derive_focus_line(self, metrics: Optional[FileMetrics]) -> int | None:
         if not metrics:
             return None
+        fallback = 1 if (metrics.lines_of_code or 0) > 0 else None
+        return next((line for line in self._focus_line_candidates(metrics) if line), fallback)
 
-        def pick_first_line(entries: List[Dict] | None, primary: str = 'line', fallback: str = 'start_line') -> int | None:
+    def _focus_line_candidates(self, metrics: FileMetrics) -> Iterator[int | None]:
+        """按优先级依次产出各来源的首个有效行号，调用方取到第一个即停止"""
+        def first_line(entries: List[Dict] | None, primary: str = 'line', fallback: str = 'start_line') -> int | None:
             for entry in entries or []:
                 for key in (primary, fallback):
                     value = entry.get(key)
@@ -153,43 +167,20 @@ class TechnicalDebtCalculator:
                         return int(value)
             return None
 
-        line = pick_first_line(metrics.get('high_complexity_blocks') or [], 'start_line', 'line')
-        if line:
-            return line
-
-        line = pick_first_line(metrics.get('deeply_nested_functions') or [])
-        if line:
-            return line
+        yield first_line(metrics.high_complexity_blocks, 'start_line', 'line')
+        yield first_line(metrics.deeply_nested_functions)
+        yield first_line(metrics.long_parameter_functions, 'line', 'start_line')
+        yield first_line(metrics.complex_conditionals)
+        yield first_line(metrics.uninformative_identifiers)
 
-        line = pick_first_line(metrics.get('long_parameter_functions') or [], 'line', 'start_line')
-        if line:
-            return line
-
-        line = pick_first_line(metrics.get('complex_conditionals') or [])
-        if line:
-            return line
-
-        line = pick_first_line(metrics.get('uninformative_identifiers') or [])
-        if line:
-            return line
-
-        samples = metrics.get('smell_samples') or {}
-        long_functions = samples.get('long_functions') or []
-        line = pick_first_line(long_functions, 'start_line', 'line')
-        if line:
-            return line
+        samples = metrics.smell_samples or {}
+        yield first_line(samples.get('long_functions'), 'start_line', 'line')
 
         for item in samples.get('long_lines') or []:
             if isinstance(item, (list, tuple)) and item:
                 candidate = item[0]
                 if isinstance(candidate, (int, float)) and candidate > 0:
-                    return int(candidate)
-
-        line = pick_first_line(samples.get('complex_conditionals') or [])
-        if line:
-            return line
-
-        if (metrics.get('lines_of_code') or 0) > 0:
-            return 1
+                    yield int(candidate)
+                    break
 
-        return None
\ No newline at end of file
+        yield first_line(samples.get('complex_conditionals'))
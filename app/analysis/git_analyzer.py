@@ -1,28 +1,47 @@
 # app/analysis/git_analyzer.py
+import asyncio
+from collections import defaultdict
 from datetime import datetime, timezone
+import hashlib
+import json
 import logging
+import os
+import re
+import threading
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
-from pydriller import Repository
+import numpy as np
+from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError, Repo
 
 from app.analysis.base import BaseAnalyzer
 
 
 logger = logging.getLogger(__name__)
 
+# 扩展名不含点，直接与路径切片比较，避免每个修改文件构造 Path 对象
+TRACKED_EXTENSIONS = frozenset({'py', 'js', 'ts', 'java', 'go', 'cpp', 'c', 'jsx', 'tsx'})
+# git log 每个提交的头部：哈希、作者名、提交时间（严格 ISO 8601），字段间以 \x01 分隔
+COMMIT_FIELD_SEP = '\x01'
+LOG_FORMAT = '--format=%H%x01%an%x01%cI'
+NUMSTAT_RE = re.compile(r'(\d+|-)\t(\d+|-)\t(.*)', re.DOTALL)
+# 按仓库路径缓存原始聚合数据及对应 HEAD，历史未变化时直接复用，新增提交时增量合并
+CACHE_DIR = Path(__file__).resolve().parents[2] / '.cache' / 'git_heat'
+_CACHE_LOCK = threading.Lock()
+
 
 class GitHistoryAnalyzer(BaseAnalyzer):
     """Git历史分析器"""
 
     async def analyze(self, project_path: str) -> Dict:
+        # GitPython 调用与 git 子进程读取都是阻塞的，放到线程中执行，不占用事件循环
+        return await asyncio.to_thread(self._analyze_sync, project_path)
+
+    def _analyze_sync(self, project_path: str) -> Dict:
         repo_root = self._resolve_repo_root(project_path)
-        heat_data: Dict[str, Dict] = {}
-        tracked_exts = {'.py', '.js', '.ts', '.java', '.go', '.cpp', '.c', '.jsx', '.tsx'}
 
         try:
-            repository = Repository(str(repo_root))
+            git_repo = Repo(str(repo_root))
         except (InvalidGitRepositoryError, NoSuchPathError, GitCommandError) as exc:
             logger.warning("Git history unavailable at %s: %s", repo_root, exc)
             return {}
@@ -31,71 +50,243 @@ class GitHistoryAnalyzer(BaseAnalyzer):
             return {}
 
         try:
-            for commit in repository.traverse_commits():
-                commit_time = self._ensure_timezone(commit.committer_date)
-                author_name = commit.author.name or "unknown"
-
-                for file in commit.modified_files:
-                    rel_path = self._resolve_file_path(file)
-                    if not rel_path:
-                        continue
+            head = git_repo.git.rev_parse('HEAD')
+            cached_head, heat_data = self._load_cache(repo_root)
+            if cached_head == head:
+                return self._calculate_heat_scores(heat_data)
 
-                    if Path(rel_path).suffix.lower() not in tracked_exts:
-                        continue
+            # 历史只追加：缓存的 HEAD 仍是当前 HEAD 的祖先时只遍历新增提交，否则（如 rebase/强推）全量重算
+            if cached_head and self._is_ancestor(git_repo, cached_head):
+                revision = f'{cached_head}..HEAD'
+            else:
+                revision = 'HEAD'
+                heat_data = {}
 
-                    entry = heat_data.setdefault(rel_path, {
-                        'change_count': 0,
-                        'authors': set(),
-                        'last_modified': None,
-                        'added_lines': 0,
-                        'deleted_lines': 0,
-                    })
-
-                    entry['change_count'] += 1
-                    entry['authors'].add(author_name)
-                    entry['added_lines'] += abs(file.added_lines or 0)
-                    entry['deleted_lines'] += abs(file.deleted_lines or 0)
-                    entry['last_modified'] = commit_time if not entry['last_modified'] or commit_time > entry['last_modified'] else entry['last_modified']
+            self._merge_heat(heat_data, self._collect_heat(git_repo, revision))
+            self._store_cache(repo_root, head, heat_data)
         except (InvalidGitRepositoryError, NoSuchPathError, GitCommandError) as exc:
             logger.warning("Git history traversal failed at %s: %s", repo_root, exc)
             return {}
         except Exception as exc:
             logger.exception("Unexpected git history traversal failure at %s", repo_root)
             return {}
+        finally:
+            git_repo.close()
 
         return self._calculate_heat_scores(heat_data)
 
+    def _collect_heat(self, git_repo: Repo, revision: str) -> Dict[str, Dict]:
+        """统计一段提交区间中各文件的修改次数、作者、增删行数与最近修改时间
+
+        只需要路径与增删行数，直接解析一次 `git log --numstat` 的输出，不再逐个提交构造完整 diff。
+        合并提交不产生文件修改记录，用 --no-merges 排除；-M 与逐提交 diff 的重命名检测保持一致。
+        """
+        # 遍历期间每个文件用列表累积：[change_count, authors, last_modified, added_lines, deleted_lines]，
+        # 按下标读写比逐次查字典键快，遍历结束后再转换为统一的字典结构
+        entries: Dict[str, list] = defaultdict(lambda: [0, set(), None, 0, 0])
+        commit_time = None
+        author_name = None
+        rename_paths: List[str] = []
+        pending_rename: Optional[Tuple[int, int]] = None
+        extension = self._extension
+
+        proc = git_repo.git.log(
+            revision, '--no-merges', '--numstat', '-M', '-z', LOG_FORMAT,
+            as_process=True,
+        )
+        try:
+            for token in self._iter_log_tokens(proc.stdout):
+                if pending_rename is not None:
+                    # 重命名条目：numstat 之后依次是旧路径、新路径，按新路径计入
+                    rename_paths.append(token)
+                    if len(rename_paths) < 2:
+                        continue
+                    added, deleted = pending_rename
+                    rel_path = rename_paths[1]
+                    pending_rename = None
+                    rename_paths = []
+                else:
+                    token = token.lstrip('\n')
+                    if not token:
+                        continue
+
+                    stat = NUMSTAT_RE.match(token)
+                    if stat is None:
+                        _, author, committed = token.split(COMMIT_FIELD_SEP, 2)
+                        author_name = author or "unknown"
+                        commit_time = self._ensure_timezone(datetime.fromisoformat(committed))
+                        continue
+
+                    added, deleted, rel_path = stat.groups()
+                    # 二进制文件的增删行显示为 '-'
+                    added = int(added) if added != '-' else 0
+                    deleted = int(deleted) if deleted != '-' else 0
+                    if not rel_path:
+                        pending_rename = (added, deleted)
+                        continue
+
+                if extension(rel_path) not in TRACKED_EXTENSIONS:
+                    continue
+
+                entry = entries[rel_path]
+                entry[0] += 1
+                entry[1].add(author_name)
+                entry[3] += added
+                entry[4] += deleted
+                if entry[2] is None or commit_time > entry[2]:
+                    entry[2] = commit_time
+        finally:
+            proc.stdout.close()
+            proc.wait()
+
+        return {
+            rel_path: {
+                'change_count': entry[0],
+                'authors': entry[1],
+                'last_modified': entry[2],
+                'added_lines': entry[3],
+                'deleted_lines': entry[4],
+            }
+            for rel_path, entry in entries.items()
+        }
+
+    def _iter_log_tokens(self, stream, chunk_size: int = 1 << 16) -> Iterator[str]:
+        """按 NUL 切分 `git log -z` 的输出，流式读取避免一次性载入整段历史"""
+        buffer = b''
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            buffer += chunk
+            *tokens, buffer = buffer.split(b'\0')
+            for token in tokens:
+                yield token.decode('utf-8', errors='replace')
+        if buffer:
+            yield buffer.decode('utf-8', errors='replace')
+
+    def _merge_heat(self, target: Dict[str, Dict], partial: Dict[str, Dict]) -> None:
+        for rel_path, data in partial.items():
+            entry = target.get(rel_path)
+            if entry is None:
+                target[rel_path] = data
+                continue
+            entry['change_count'] += data['change_count']
+            entry['authors'] |= data['authors']
+            entry['added_lines'] += data['added_lines']
+            entry['deleted_lines'] += data['deleted_lines']
+            if data['last_modified'] and (not entry['last_modified'] or data['last_modified'] > entry['last_modified']):
+                entry['last_modified'] = data['last_modified']
+
+    def _is_ancestor(self, git_repo: Repo, commit_hash: str) -> bool:
+        try:
+            return git_repo.is_ancestor(commit_hash, 'HEAD')
+        except (GitCommandError, ValueError):
+            # 缓存中的提交已不存在（如被 gc 清理）
+            return False
+
+    def _cache_path(self, repo_root: Path) -> Path:
+        key = hashlib.sha1(str(repo_root).encode('utf-8')).hexdigest()
+        return CACHE_DIR / f'{key}.json'
+
+    def _load_cache(self, repo_root: Path) -> Tuple[Optional[str], Dict[str, Dict]]:
+        """读取上次分析时的 HEAD 与原始聚合数据；缓存缺失或损坏时返回 (None, {})"""
+        path = self._cache_path(repo_root)
+        try:
+            with path.open('r', encoding='utf-8') as cache_file:
+                payload = json.load(cache_file)
+            heat_data = {}
+            for rel_path, data in payload['heat_data'].items():
+                heat_data[rel_path] = {
+                    'change_count': data['change_count'],
+                    'authors': set(data['authors']),
+                    'last_modified': datetime.fromisoformat(data['last_modified']) if data['last_modified'] else None,
+                    'added_lines': data['added_lines'],
+                    'deleted_lines': data['deleted_lines'],
+                }
+            return payload['head'], heat_data
+        except FileNotFoundError:
+            return None, {}
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("Ignoring unreadable git heat cache %s: %s", path, exc)
+            return None, {}
+
+    def _store_cache(self, repo_root: Path, head: str, heat_data: Dict[str, Dict]) -> None:
+        path = self._cache_path(repo_root)
+        payload = {
+            'repo_root': str(repo_root),
+            'head': head,
+            'heat_data': {
+                rel_path: {
+                    'change_count': data['change_count'],
+                    'authors': sorted(data['authors']),
+                    'last_modified': data['last_modified'].isoformat() if data['last_modified'] else None,
+                    'added_lines': data['added_lines'],
+                    'deleted_lines': data['deleted_lines'],
+                }
+                for rel_path, data in heat_data.items()
+            },
+        }
+        try:
+            with _CACHE_LOCK:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # 先写临时文件再原子替换，避免并发读到半截内容
+                tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+                with tmp_path.open('w', encoding='utf-8') as cache_file:
+                    json.dump(payload, cache_file, ensure_ascii=False)
+                os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("Failed to write git heat cache %s: %s", path, exc)
+
     def _calculate_heat_scores(self, heat_data: Dict) -> Dict:
-        """计算热点分数"""
-        scores = {}
+        """计算热点分数（在全部文件上向量化计算）"""
         now = datetime.now(timezone.utc)
+        rows = list(heat_data.values())
+        n = len(rows)
 
-        for file_path, data in heat_data.items():
-            change_score = min(data['change_count'] / 5, 1.0)
-            churn = data['added_lines'] + data['deleted_lines']
-            churn_score = min(churn / 400, 1.0)
-            author_diversity = min(len(data['authors']) / 4, 1.0)
-
-            recency_score = 0.0
-            if data['last_modified']:
-                age_days = max(0, (now - data['last_modified']).days)
-                if age_days <= 7:
-                    recency_score = 1.0
-                else:
-                    recency_score = max(0.0, 1 - age_days / 180)
-            heat_score = min(1.0, 0.35 * change_score + 0.3 * churn_score + 0.2 * author_diversity + 0.15 * recency_score)
+        change_count = np.fromiter((data['change_count'] for data in rows), dtype=np.float64, count=n)
+        churn = np.fromiter((data['added_lines'] + data['deleted_lines'] for data in rows), dtype=np.int64, count=n)
+        author_count = np.fromiter((len(data['authors']) for data in rows), dtype=np.float64, count=n)
+        has_modified = np.fromiter((data['last_modified'] is not None for data in rows), dtype=bool, count=n)
+        # timedelta.days 向下取整，逐行取整数天数以保持与原先逐文件计算一致
+        age_days = np.fromiter(
+            ((now - data['last_modified']).days if data['last_modified'] else 0 for data in rows),
+            dtype=np.float64,
+            count=n,
+        )
 
+        change_score = np.minimum(change_count / 5, 1.0)
+        churn_score = np.minimum(churn / 400, 1.0)
+        author_diversity = np.minimum(author_count / 4, 1.0)
+        age_days = np.maximum(0, age_days)
+        recency_score = np.where(
+            has_modified,
+            np.where(age_days <= 7, 1.0, np.maximum(0.0, 1 - age_days / 180)),
+            0.0,
+        )
+        heat_score = np.minimum(1.0, 0.35 * change_score + 0.3 * churn_score + 0.2 * author_diversity + 0.15 * recency_score)
+
+        scores = {}
+        columns = zip(
+            heat_data.items(),
+            heat_score.tolist(),
+            churn.tolist(),
+            change_score.tolist(),
+            churn_score.tolist(),
+            author_diversity.tolist(),
+            recency_score.tolist(),
+        )
+        for (file_path, data), heat, file_churn, change, churn_value, authors, recency in columns:
             scores[file_path] = {
-                'heat_score': heat_score,
+                'heat_score': heat,
                 'change_count': data['change_count'],
                 'author_count': len(data['authors']),
-                'churn': churn,
+                'churn': file_churn,
                 'last_modified': data['last_modified'].isoformat() if data['last_modified'] else None,
                 'score_breakdown': {
-                    'change_score': change_score,
-                    'churn_score': churn_score,
-                    'author_diversity': author_diversity,
-                    'recency_score': recency_score,
+                    'change_score': change,
+                    'churn_score': churn_value,
+                    'author_diversity': authors,
+                    'recency_score': recency,
                 }
             }
 
@@ -105,11 +296,11 @@ class GitHistoryAnalyzer(BaseAnalyzer):
         candidate = Path(project_path).resolve()
         return candidate if candidate.is_dir() else candidate.parent
 
-    def _resolve_file_path(self, file) -> Optional[str]:
-        rel_path = file.new_path or file.old_path or file.filename
-        if not rel_path:
-            return None
-        return str(Path(rel_path).as_posix())
+    def _extension(self, rel_path: str) -> str:
+        """与 Path.suffix 相同的规则取小写扩展名（不含点）：只看最后一段，点开头的文件名视为无扩展名"""
+        name = rel_path[rel_path.rfind('/') + 1:]
+        dot = name.rfind('.')
+        return name[dot + 1:].lower() if dot > 0 else ''
 
     def _ensure_timezone(self, dt: datetime) -> datetime:
         if dt.tzinfo is None:
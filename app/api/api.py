@@ -1,11 +1,18 @@
 # app/api/api.py
+from urllib.parse import urlsplit
+
 from fastapi import APIRouter
+from app.core.config import settings
 from app.core.database import get_db
 from fastapi import Depends
-import socket
+from app.core.redis_client import RedisError, get_redis
 
 api_router = APIRouter()
 
+# REDIS_URL 在进程内不变：启动时解析一次；健康检查复用 app.core.redis_client 的共享客户端（及其连接池），
+# 其超时上限保证 Redis 不可达时存活探针不会被挂住
+_REDIS_URL_PARSED = urlsplit(settings.REDIS_URL)
+
 
 @api_router.get("/")
 async def root():
@@ -25,34 +32,20 @@ def health(db=Depends(get_db)):
         status["ok"] = False
 
     # Redis 检查（非强制）
-    try:
-        from app.core.config import settings
-        import redis
-        r = redis.from_url(settings.REDIS_URL)
-        r.ping()
-        status["redis"] = "ok"
-    except Exception as e:
-        status["redis"] = f"error: {str(e)}"
+    client = get_redis()
+    if client is None:
+        status["redis"] = "error: redis package is not installed"
         status["ok"] = False
-
-    # Celery 检查：尝试获取 broker info via socket if REDIS_URL is tcp
-    try:
-        from app.core.config import settings
-        if settings.REDIS_URL.startswith('redis://'):
-            # attempt to parse host:port
-            import re
-            m = re.search(r'redis://([^:/]+):(\d+)', settings.REDIS_URL)
-            if m:
-                host = m.group(1)
-                port = int(m.group(2))
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(1)
-                try:
-                    sock.connect((host, port))
-                    status["celery"] = "ready"
-                finally:
-                    sock.close()
-    except Exception:
-        status["celery"] = "unknown"
-
-    return status
\ No newline at end of file
+    else:
+        try:
+            client.ping()
+            status["redis"] = "ok"
+        except RedisError as e:
+            status["redis"] = f"error: {str(e)}"
+            status["ok"] = False
+
+    # Celery 检查：broker 即 REDIS_URL，ping 成功已说明 broker 可达，无需再单独建立 TCP 连接
+    if _REDIS_URL_PARSED.scheme == 'redis' and status["redis"] == "ok":
+        status["celery"] = "ready"
+
+    return status
@@ -1,79 +1,88 @@
 # app/api/debts.py
-import asyncio
 import json
 import logging
 import os
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException
 from fastapi.params import Depends, Query
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
+from app.core.responses import ORJSONResponse
 from app.models.debt import TechnicalDebt
 from app.models.project import Project
-from app.repositories.debt_repository import DebtRepository
+from app.repositories.debt_repository import IS_NT, DebtRepository, _normalize_path
 from app.repositories.project_repository import ProjectRepository
-from app.services.analysis_orchestrator import AnalysisOrchestrator
-from app.tasks.analysis_tasks import _serialize_metadata, _write_scan_log
+from app.services.analysis_orchestrator import get_orchestrator
+from app.services.current_scan import _normalize_storage_path, _persist_debt_scores
+from app.tasks.analysis_tasks import _run_async, _write_scan_log
+
+try:
+    import orjson as _orjson
+except Exception:
+    _orjson = None
 
 debt_router = APIRouter(prefix="/debts", tags=["debts"])
 logger = logging.getLogger(__name__)
 
+# 解析内联分析目标路径时并发探测候选路径（网络盘等冷缓存下 stat 延迟较高）
+_PATH_PROBE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="debt-path-probe")
 
-def _normalize_path(p: str) -> Optional[str]:
-    if not p:
-        return p
-    p = os.path.normpath(p)
-    p = p.replace('\\', '/').rstrip('/')
-    if os.name == 'nt':
-        p = p.lower()
-    return p
+# 不带 wait 的重新分析在专用线程池中执行，不占用请求线程池与其限流配额
+INLINE_ANALYSIS_WORKERS = 2
+_INLINE_ANALYSIS_POOL = ThreadPoolExecutor(max_workers=INLINE_ANALYSIS_WORKERS, thread_name_prefix="debt-inline-analysis")
+# 进行中的 (project_id, 规范化路径)；同一文件已在分析时不再重复提交
+_INLINE_IN_FLIGHT: set = set()
+_INLINE_IN_FLIGHT_LOCK = threading.Lock()
 
 
 @debt_router.get("/project/{project_id}")
-def get_project_debts(project_id: int, file_path: Optional[str] = Query(None), db: Session = Depends(get_db)):
+def get_project_debts(
+    project_id: int,
+    file_path: Optional[str] = Query(None),
+    wait: bool = Query(False),
+    db: Session = Depends(get_db)
+):
     """返回项目债务列表，支持可选的 file_path 查询参数。返回标准化 debt 对象数组（可能为空）。
 
-    Incoming `file_path` will be normalized (normpath, backslashes -> '/', strip trailing slash).
-    Comparison is done against a normalized DB expression to improve Windows compatibility.
+    Incoming `file_path` will be normalized (normpath, backslashes -> '/', strip trailing slash)
+    and compared against the `file_path_normalized` column populated at write time.
+
+    带 file_path 时默认立即返回已持久化的结果，重新分析提交到专用线程池执行（同一文件进行中时不重复提交），
+    并通过 `X-Analysis-Pending: true` 响应头告知前端；`?wait=true` 保持原来的同步分析行为。
     """
+    pending = False
     try:
         if file_path:
-            _run_inline_analysis(db, project_id, file_path)
+            if wait:
+                _run_inline_analysis(db, project_id, file_path)
+            else:
+                if not ProjectRepository(Project, db).get(project_id):
+                    detail = {"error": "project_not_found", "message": "Project not found"}
+                    _log_analysis_error(project_id, file_path, detail)
+                    raise HTTPException(status_code=404, detail=detail)
+                _submit_inline_analysis(project_id, file_path)
+                pending = True
 
         repo = DebtRepository(TechnicalDebt, db)
         query = db.query(TechnicalDebt).filter(TechnicalDebt.project_id == project_id)
         if file_path:
-            norm = _normalize_path(file_path)
-            if os.name == 'nt':
-                db_expr = func.lower(func.rtrim(func.replace(TechnicalDebt.file_path, '\\', '/'), '/'))
-                query = query.filter(db_expr == norm)
-            else:
-                db_expr = func.rtrim(func.replace(TechnicalDebt.file_path, '\\', '/'), '/')
-                query = query.filter(db_expr == norm)
+            # file_path_normalized 在写入时已规范化，直接命中 (project_id, file_path_normalized) 索引
+            query = query.filter(TechnicalDebt.file_path_normalized == _normalize_path(file_path))
 
         debts = query.all()
 
-        results = []
-        for d in debts:
-            metadata = _load_metadata(d.project_metadata)
-            results.append({
-                "id": d.id,
-                "file_path": d.file_path,
-                # 'line' may not be available in current model; provide None if missing
-                "line": getattr(d, 'line', None),
-                "severity": d.severity,
-                "message": d.description,
-                "status": d.status,
-                "metadata": metadata,
-                "created_at": d.created_at.isoformat() if getattr(d, 'created_at', None) else None,
-                "updated_at": d.updated_at.isoformat() if getattr(d, 'updated_at', None) else None
-            })
-        return results
+        response = ORJSONResponse([_debt_to_dict(d) for d in debts])
+        # 行已序列化进响应体：提前归还连接，不必等到 get_db 清理
+        db.close()
+        if pending:
+            response.headers["X-Analysis-Pending"] = "true"
+        return response
     except HTTPException:
         raise
     except Exception as e:
@@ -96,24 +105,60 @@ def update_debt_status(debt_id: int, payload: dict, db: Session = Depends(get_db
             raise HTTPException(status_code=404, detail={"error": "not_found", "message": "Debt not found"})
 
         updated = repo.update(debt_id, {"status": status_val})
-        metadata = _load_metadata(updated.project_metadata)
-        return {
-            "id": updated.id,
-            "file_path": updated.file_path,
-            "line": getattr(updated, 'line', None),
-            "severity": updated.severity,
-            "message": updated.description,
-            "status": updated.status,
-            "metadata": metadata,
-            "created_at": updated.created_at.isoformat() if getattr(updated, 'created_at', None) else None,
-            "updated_at": updated.updated_at.isoformat() if getattr(updated, 'updated_at', None) else None
-        }
+        return ORJSONResponse(_debt_to_dict(updated))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=503, detail={"error": "dependency_unavailable", "service": "db", "message": str(e)})
 
 
+def _debt_to_dict(d: TechnicalDebt) -> Dict:
+    # 字段均为模型列，直接访问；datetime 交给 orjson 原生序列化
+    return {
+        "id": d.id,
+        "file_path": d.file_path,
+        "line": d.line,
+        "severity": d.severity,
+        "message": d.description,
+        "status": d.status,
+        "metadata": _load_metadata(d.project_metadata),
+        "created_at": d.created_at,
+        "updated_at": d.updated_at,
+    }
+
+
+def _submit_inline_analysis(project_id: int, incoming_path: str) -> bool:
+    """提交后台重新分析；同一文件已有进行中的分析时跳过，返回是否提交"""
+    key = (project_id, _normalize_path(incoming_path) or incoming_path)
+    with _INLINE_IN_FLIGHT_LOCK:
+        if key in _INLINE_IN_FLIGHT:
+            return False
+        _INLINE_IN_FLIGHT.add(key)
+    try:
+        _INLINE_ANALYSIS_POOL.submit(_run_inline_analysis_background, key, project_id, incoming_path)
+    except Exception:
+        with _INLINE_IN_FLIGHT_LOCK:
+            _INLINE_IN_FLIGHT.discard(key)
+        raise
+    return True
+
+
+def _run_inline_analysis_background(key: tuple, project_id: int, incoming_path: str):
+    # 在专用线程池中执行，使用独立的会话
+    db = SessionLocal()
+    try:
+        _run_inline_analysis(db, project_id, incoming_path)
+    except HTTPException as exc:
+        # 错误已由 _run_inline_analysis 记录到扫描日志
+        logger.info("Background inline analysis finished with status=%s project=%s file=%s", exc.status_code, project_id, incoming_path)
+    except Exception:
+        logger.exception("Background inline analysis failed project=%s file=%s", project_id, incoming_path)
+    finally:
+        db.close()
+        with _INLINE_IN_FLIGHT_LOCK:
+            _INLINE_IN_FLIGHT.discard(key)
+
+
 def _run_inline_analysis(db: Session, project_id: int, incoming_path: str):
     project_repo = ProjectRepository(Project, db)
     project = project_repo.get(project_id)
@@ -133,11 +178,14 @@ def _run_inline_analysis(db: Session, project_id: int, incoming_path: str):
             return
         raise
 
-    orchestrator = AnalysisOrchestrator()
+    project_path = project.local_path or resolved_file
+    # 分析期间不持有连接：结束只读事务，持久化时会话再按需取连接
+    db.close()
+
+    orchestrator = get_orchestrator()
     try:
-        analysis_result = asyncio.run(
-            orchestrator.analyze_project(project.local_path or resolved_file, file_path=resolved_file)
-        )
+        # 线程内常驻的事件循环，不像 asyncio.run 那样每次新建/销毁
+        analysis_result = _run_async(orchestrator.analyze_project(project_path, file_path=resolved_file))
     except HTTPException as http_exc:
         if http_exc.status_code == 404 and _is_virtual_path(incoming_path):
             detail = {"info": "virtual_path_skipped", "message": "Virtual document was ignored"}
@@ -171,6 +219,17 @@ def _run_inline_analysis(db: Session, project_id: int, incoming_path: str):
         _write_scan_log(project_id, persisted)
 
 
+def _resolve_existing(candidate: Optional[Path]) -> Optional[str]:
+    if not candidate:
+        return None
+    try:
+        if candidate.exists():
+            return str(candidate.resolve())
+    except Exception:
+        return None
+    return None
+
+
 def _resolve_target_path(project: Project, incoming_path: str) -> str:
     if not incoming_path:
         detail = {"error": "invalid_path", "message": "File path is required"}
@@ -191,20 +250,16 @@ def _resolve_target_path(project: Project, incoming_path: str) -> str:
         except Exception:
             pass
 
-    for candidate in candidates:
-        if not candidate:
-            continue
-        try:
-            if candidate.exists():
-                return str(candidate.resolve())
-        except Exception:
-            continue
+    # 各候选路径的 stat 相互独立且会释放 GIL，并发探测后仍按候选顺序取第一个命中项
+    for resolved in _PATH_PROBE_POOL.map(_resolve_existing, candidates):
+        if resolved:
+            return resolved
 
     if project and project.local_path:
         root = Path(project.local_path).resolve()
         relative_candidates = _build_relative_candidates(root, incoming_path)
-        for rel in relative_candidates:
-            matched = _case_insensitive_lookup(root, rel)
+        lookups = _PATH_PROBE_POOL.map(lambda rel: _case_insensitive_lookup(root, rel), relative_candidates)
+        for matched in lookups:
             if matched:
                 return str(matched.resolve())
 
@@ -227,6 +282,13 @@ def _is_virtual_path(path: str | None) -> bool:
     return False
 
 
+def _is_absolute_path(path: str) -> bool:
+    """字符串层面的 Path.is_absolute()；path 已统一为 '/' 分隔"""
+    if IS_NT:
+        return path.startswith('//') or (len(path) > 2 and path[1] == ':' and path[2] == '/')
+    return path.startswith('/')
+
+
 def _build_relative_candidates(root: Path, incoming_path: str) -> List[str]:
     candidates: List[str] = []
     normalized_incoming = str(incoming_path).replace('\\', '/').strip()
@@ -234,48 +296,70 @@ def _build_relative_candidates(root: Path, incoming_path: str) -> List[str]:
     if not normalized_incoming:
         return candidates
 
-    incoming_path_obj = Path(normalized_incoming)
-    if not incoming_path_obj.is_absolute():
+    if not _is_absolute_path(normalized_incoming):
         candidates.append(normalized_incoming)
     else:
-        lower_root = str(root).lower().rstrip('/\\')
-        lower_incoming = str(incoming_path_obj).lower()
+        lower_root = str(root).replace('\\', '/').lower().rstrip('/')
+        lower_incoming = normalized_incoming.lower()
         if lower_incoming.startswith(lower_root):
-            rel = lower_incoming[len(lower_root):].lstrip('/\\')
+            rel = lower_incoming[len(lower_root):].strip('/')
             if rel:
                 candidates.append(rel)
 
-    parts = normalized_incoming.split('/')
-    if parts:
-        stripped = '/'.join(part for part in parts if part not in {'', '.'})
-        if stripped and stripped not in candidates:
-            candidates.append(stripped)
+    stripped = '/'.join(part for part in normalized_incoming.split('/') if part not in {'', '.'})
+    if stripped and stripped not in candidates:
+        candidates.append(stripped)
 
     return candidates
 
 
+# 目录名映射缓存：目录路径 -> (st_mtime_ns, {小写名: 实际名}, 按扫描顺序的名称列表)；目录内容变化时 mtime 随之变化
+_DIR_CACHE: Dict[str, Tuple[int, Dict[str, str], List[str]]] = {}
+DIR_CACHE_MAX_ENTRIES = 1024
+
+
+def _scan_directory(directory: str) -> Optional[Tuple[Dict[str, str], List[str]]]:
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    cached = _DIR_CACHE.get(directory)
+    if cached and cached[0] == mtime_ns:
+        return cached[1], cached[2]
+
+    try:
+        with os.scandir(directory) as it:
+            names = [entry.name for entry in it]
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    lowered_map = {name.lower(): name for name in names}
+    if len(_DIR_CACHE) >= DIR_CACHE_MAX_ENTRIES:
+        _DIR_CACHE.clear()
+    _DIR_CACHE[directory] = (mtime_ns, lowered_map, names)
+    return lowered_map, names
+
+
 def _case_insensitive_lookup(root: Path, relative_path: str) -> Optional[Path]:
-    current = root
-    for part in Path(relative_path).parts:
+    current = str(root)
+    for part in relative_path.replace('\\', '/').split('/'):
         if part in {'.', ''}:
             continue
-        try:
-            entries = list(current.iterdir())
-        except FileNotFoundError:
+        scanned = _scan_directory(current)
+        if scanned is None:
             return None
-        lowered_map = {entry.name.lower(): entry for entry in entries}
+        lowered_map, names = scanned
         target = part.lower()
         match = lowered_map.get(target)
         if not match:
             stripped_target = target.lstrip('_')
-            for entry in entries:
-                if entry.name.lower().lstrip('_') == stripped_target:
-                    match = entry
+            for name in names:
+                if name.lower().lstrip('_') == stripped_target:
+                    match = name
                     break
         if not match:
             return None
-        current = match
-    return current if current.exists() else None
+        current = os.path.join(current, match)
+    return Path(current) if os.path.exists(current) else None
 
 
 def _log_analysis_error(project_id: Optional[int], file_path: Optional[str], detail: Dict, exc: Exception | None = None):
@@ -307,86 +391,13 @@ def _log_analysis_error(project_id: Optional[int], file_path: Optional[str], det
         logger.exception("Failed to write analysis error log for project=%s file=%s", project_id, file_path)
 
 
-def _persist_debt_scores(db: Session, project_id: int, debt_scores: Dict) -> List[Dict]:
-    persisted: List[Dict] = []
-
-    for raw_path, debt_data in debt_scores.items():
-        stored_path = _choose_storage_path(raw_path, debt_data)
-        normalized_lookup = _normalize_path(stored_path)
-
-        query = db.query(TechnicalDebt).filter(TechnicalDebt.project_id == project_id)
-        if normalized_lookup:
-            db_expr = func.lower(func.rtrim(func.replace(TechnicalDebt.file_path, '\\', '/'), '/'))
-            query = query.filter(db_expr == normalized_lookup)
-        else:
-            query = query.filter(TechnicalDebt.file_path == stored_path)
-
-        description = f"Technical debt hotspot: {debt_data.get('debt_score', 0.0):.2f} score"
-        metadata_json = _serialize_metadata(debt_data)
-        existing = query.first()
-
-        if existing:
-            existing.file_path = stored_path
-            existing.line = debt_data.get('line')
-            existing.debt_type = 'hotspot'
-            existing.severity = debt_data.get('severity', 'low')
-            existing.description = description
-            existing.estimated_effort = debt_data.get('estimated_effort')
-            existing.project_metadata = metadata_json
-        else:
-            new_debt = TechnicalDebt(
-                project_id=project_id,
-                file_path=stored_path,
-                line=debt_data.get('line'),
-                debt_type='hotspot',
-                severity=debt_data.get('severity', 'low'),
-                description=description,
-                estimated_effort=debt_data.get('estimated_effort'),
-                project_metadata=metadata_json,
-            )
-            db.add(new_debt)
-
-        persisted.append({
-            'file_path': stored_path,
-            'debt_score': debt_data.get('debt_score', 0.0),
-            'severity': debt_data.get('severity', 'low'),
-            'metadata': debt_data,
-        })
-
-    db.commit()
-    return persisted
-
-
 def _load_metadata(raw_value: Optional[str]):
     if not raw_value:
         return None
     try:
+        if _orjson is not None:
+            return _orjson.loads(raw_value)
         return json.loads(raw_value)
     except (TypeError, ValueError):
         logger.warning("Failed to parse technical debt metadata")
         return None
-
-
-def _choose_storage_path(raw_key: str, debt_data: Dict) -> str:
-    candidates = [
-        (debt_data.get('complexity_metrics') or {}).get('relative_path'),
-        raw_key,
-        (debt_data.get('complexity_metrics') or {}).get('absolute_path'),
-    ]
-
-    for candidate in candidates:
-        if candidate:
-            normalized = _normalize_storage_path(candidate)
-            if normalized:
-                return normalized
-
-    return _normalize_storage_path(raw_key)
-
-
-def _normalize_storage_path(value: str) -> str:
-    if not value:
-        return ''
-    normalized = str(value).replace('\\', '/').rstrip('/')
-    if os.name == 'nt':
-        normalized = normalized.lower()
-    return normalized
\ No newline at end of file
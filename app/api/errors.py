@@ -0,0 +1,69 @@
+# app/api/errors.py
+"""全局异常处理：服务层异常与外部依赖错误统一映射为 HTTP 响应，路由中不再逐个 try/except。
+
+响应体沿用 HTTPException 的 {"detail": {...}} 结构，与原先各路由返回的格式一致。
+"""
+from typing import Final
+
+from fastapi import FastAPI, Request, status
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from app.core.responses import ORJSONResponse
+from app.services.exceptions import AlreadyAnalyzing, DependencyUnavailable, ProjectNotFound, ServiceError
+from app.services.project_service import BROKER_CLIENT_ERRORS
+
+# 服务层异常 -> (HTTP 状态码, 错误码)
+_SERVICE_ERROR_STATUS: Final = {
+    # 项目正在被分析/处理；使用 423 (Locked) 更清晰地表达资源被占用的语义
+    AlreadyAnalyzing: (status.HTTP_423_LOCKED, "conflict"),
+    ProjectNotFound: (status.HTTP_404_NOT_FOUND, "not_found"),
+    DependencyUnavailable: (status.HTTP_503_SERVICE_UNAVAILABLE, "dependency_unavailable"),
+}
+
+
+def service_error_response(exc: ServiceError):
+    """服务层异常 -> (状态码, detail)"""
+    code, error = _SERVICE_ERROR_STATUS.get(type(exc), (status.HTTP_400_BAD_REQUEST, "bad_request"))
+    if isinstance(exc, AlreadyAnalyzing):
+        # 返回统一的中文提示，便于前端展示友好信息
+        return code, {"error": error, "message": "项目正在进行其他处理，请稍后操作"}
+    if isinstance(exc, ProjectNotFound):
+        return code, {"error": error, "message": "Project not found"}
+    if isinstance(exc, DependencyUnavailable):
+        return code, {"error": error, "service": exc.service, "message": str(exc)}
+    return code, {"error": error, "message": str(exc)}
+
+
+async def _service_error_handler(request: Request, exc: ServiceError):
+    code, detail = service_error_response(exc)
+    return ORJSONResponse(status_code=code, content={"detail": detail})
+
+
+async def _broker_error_handler(request: Request, exc: Exception):
+    # broker/redis/连接相关的错误返回 503 表示依赖不可用，便于前端重试或降级处理
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": {"error": "dependency_unavailable", "service": "redis/celery", "message": str(exc)}},
+    )
+
+
+async def _database_error_handler(request: Request, exc: SQLAlchemyError):
+    if isinstance(exc, OperationalError):
+        # 连接失败、超时等数据库不可用的情况
+        return ORJSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": {"error": "dependency_unavailable", "service": "database", "message": str(exc.orig or exc)}},
+        )
+    return ORJSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"detail": {"error": "bad_request", "message": str(exc)}},
+    )
+
+
+def register_exception_handlers(app: FastAPI):
+    app.add_exception_handler(ServiceError, _service_error_handler)
+    for exc_type in BROKER_CLIENT_ERRORS:
+        # 未安装 redis 包时 RedisError 为空元组，跳过
+        if isinstance(exc_type, type):
+            app.add_exception_handler(exc_type, _broker_error_handler)
+    app.add_exception_handler(SQLAlchemyError, _database_error_handler)
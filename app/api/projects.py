@@ -1,154 +1,173 @@
 # app/api/projects.py
 import asyncio
-from datetime import datetime, timezone
-from pathlib import Path
-from typing import List, Dict
+import hashlib
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Dict, Final, Literal
+
+from cachetools import TTLCache
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status, Body, Header, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from celery.backends.base import BaseKeyValueStoreBackend
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.schemas.project_schemas import ProjectCreate, ProjectResponse, ProjectUpdate
-from app.schemas.analysis_schemas import AnalysisResponse
+from app.core.database import SessionLocal, get_db
+from app.core.redis_client import get_redis
+from app.repositories.project_repository import ProjectRepository
+from app.core.responses import ORJSONResponse
+from app.schemas.project_schemas import ProjectCreate, ProjectResponse, ProjectSlimResponse
+from app.schemas.analysis_schemas import AnalysisStatusBatchRequest, TriggerAnalysisRequest
 from app.services.project_service import ProjectService
-from app.services.analysis_orchestrator import AnalysisOrchestrator
+from app.services.current_scan import (
+    _current_body,
+    _current_snapshot_key,
+    _filter_supported_scores,
+    _project_root,
+    _store_current_results,
+)
+from app.services.exceptions import AlreadyAnalyzing
+from app.services.analysis_orchestrator import get_orchestrator
 from app.models.project import Project
 from app.tasks.celery_app import celery_app
-from app.api.debts import _persist_debt_scores
 from app.tasks.analysis_tasks import _write_scan_log
-import traceback
-try:
-    import redis as _redis
-except Exception:
-    _redis = None
-from fastapi import Header, Request
-from datetime import timedelta
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 project_router = APIRouter(prefix="/projects", tags=["projects"])
+logger = logging.getLogger(__name__)
+
+# create_project 幂等缓存：Idempotency-Key -> 首次响应
+IDEMPOTENCY_TTL_SECONDS = 86400
+
+# list_projects 查询的列：与 ProjectResponse 字段一一对应
+_LIST_COLUMNS = tuple(getattr(Project, field) for field in ProjectResponse.model_fields)
 
+# /current 的按项目扫描锁：project_id -> [asyncio.Lock, 持有/等待者数]；无人使用时删除条目
+_CURRENT_SCAN_LOCKS: Dict[int, list] = {}
 
-SUPPORTED_SUFFIXES = {
-    '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.go', '.cpp', '.c', '.map', '.json', '.css', '.html'
+# list_projects 流式读取时每批从数据库游标取出的行数
+LIST_STREAM_BATCH = 100
+
+# Celery 任务状态 -> 对外状态
+_CELERY_STATE_MAP: Final = {
+    'pending': 'pending',
+    'received': 'pending',
+    'started': 'running',
+    'retry': 'running',
+    'success': 'completed',
+    'failure': 'failed'
 }
 
+# 状态响应中从任务 info 透传的字段
+_ANALYSIS_INFO_FIELDS: Final = ('progress', 'message', 'started_at', 'finished_at')
 
-def _is_supported_file(raw_path: str, debt_data: Dict) -> bool:
-    metrics = debt_data.get('complexity_metrics') or {}
-    language = metrics.get('language')
-    if language:
-        return True
+# 分析状态轮询缓存：analysis_id -> (status, info)，短 TTL 合并同一任务的高频轮询
+_ANALYSIS_STATE_CACHE: TTLCache = TTLCache(maxsize=10000, ttl=1.0)
+_ANALYSIS_STATE_LOCK = threading.Lock()
 
-    candidates = [
-        metrics.get('absolute_path'),
-        metrics.get('relative_path'),
-        raw_path,
-    ]
+# 项目详情缓存：(project_id, fields) -> (etag, body)。分析任务在 worker 进程中改写状态，
+# 这里无法感知，因此只保留很短的 TTL；本进程内的写操作会主动失效
+PROJECT_CACHE_TTL_SECONDS = 5
+_PROJECT_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=PROJECT_CACHE_TTL_SECONDS)
+_PROJECT_CACHE_LOCK = threading.Lock()
+
+
+def get_project_repo(db: Session = Depends(get_db)) -> ProjectRepository:
+    """按请求注入 ProjectRepository，与同一请求内的 get_db 共享会话"""
+    return ProjectRepository(Project, db)
+
+
+def _cache_get(key: str):
+    try:
+        client = get_redis()
+        return client.get(key) if client is not None else None
+    except Exception as exc:
+        logger.warning("Redis cache read failed for %s: %s", key, exc)
+        return None
+
+
+def _cache_set(key: str, value, ttl: int, nx: bool = False):
+    try:
+        client = get_redis()
+        if client is not None:
+            client.set(key, value, ex=ttl, nx=nx)
+    except Exception as exc:
+        logger.warning("Redis cache write failed for %s: %s", key, exc)
+
+
+def _project_json(project: Project) -> str:
+    """按 ProjectResponse（camelCase 别名）序列化，一次校验 + Rust 侧直接输出 JSON"""
+    return ProjectResponse.model_validate(project).model_dump_json(by_alias=True)
+
+
+def _remember_project(project: Project, idem_key: str | None, status_code: int) -> Response:
+    """返回已序列化的响应；带 Idempotency-Key 时同一份 body 写入幂等缓存"""
+    body = _project_json(project)
+    if idem_key:
+        payload = json.dumps({'status': status_code, 'body': body})
+        _cache_set(idem_key, payload, IDEMPOTENCY_TTL_SECONDS, nx=True)
+    return Response(content=body, status_code=status_code, media_type="application/json")
 
-    for candidate in candidates:
-        if not candidate:
-            continue
-        suffixes = [s.lower() for s in Path(str(candidate)).suffixes]
-        if not suffixes:
-            continue
-        last = suffixes[-1]
-        if last in SUPPORTED_SUFFIXES:
-            return True
-        if last == '.map' and len(suffixes) > 1 and suffixes[-2] in {'.js', '.ts'}:
-            return True
 
-    return False
+def _invalidate_project_cache(project_id: int):
+    with _PROJECT_CACHE_LOCK:
+        _PROJECT_CACHE.pop((project_id, None), None)
+        _PROJECT_CACHE.pop((project_id, 'slim'), None)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]
 
 
 @project_router.post("/", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
 def create_project(
     project: ProjectCreate,
     background_tasks: BackgroundTasks,
-    response: Response,
-    db: Session = Depends(get_db),
+    repo: ProjectRepository = Depends(get_project_repo),
     idempotency_key: str | None = Header(default=None, alias="Idempotency-Key")
 ):
     """创建新项目。实现基于 localPath 的去重（方案 B），短期也可接收 Idempotency-Key header。
 
     行为：如果 local_path 已存在则返回 200 和已有项目；否则创建并返回 201。
     """
-    from app.repositories.project_repository import ProjectRepository
-    repo = ProjectRepository(Project, db)
+    # 相同 Idempotency-Key 的重复请求直接返回首次的响应
+    idem_key = f"idem:project:{idempotency_key}" if idempotency_key else None
+    if idem_key:
+        cached = _cache_get(idem_key)
+        if cached:
+            try:
+                payload = json.loads(cached)
+                return Response(content=payload['body'], status_code=payload['status'], media_type="application/json")
+            except (TypeError, ValueError, KeyError):
+                pass
 
     try:
-        # 去重：先按 local_path 查找
-        lp = project.local_path
-        if lp:
-            existing = repo.get_by_local_path(lp)
+        # INSERT ... ON CONFLICT DO NOTHING：新建返回 201，路径已存在返回 200 + 已有项目（走 local_path_norm 唯一索引）；
+        # 直接返回序列化好的 body，response_model 仅用于文档
+        proj, created = repo.create_or_get_by_local_path(project.dict())
+        return _remember_project(proj, idem_key, status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    except IntegrityError as e:
+        # unique constraint 冲突（race condition）：回滚后用 local_path 再查一次，返回已存在项
+        repo.db.rollback()
+        try:
+            existing = repo.get_by_local_path(project.local_path)
             if existing:
-                # 返回 200 + existing
-                response.status_code = status.HTTP_200_OK
-                resp = {
-                    "id": existing.id,
-                    "project_id": existing.id,
-                    "name": existing.name,
-                    "localPath": existing.local_path,
-                    "language": existing.language,
-                    "status": existing.status,
-                    "current_analysis_id": existing.current_analysis_id,
-                    "currentAnalysisId": existing.current_analysis_id,
-                    "created_at": existing.created_at.isoformat() if getattr(existing, 'created_at', None) else None
-                }
-                return resp
-
-        # 否则创建
-        proj = repo.create(project.dict())
-
-        # 新建成功，保持 201
-        resp = {
-            "id": proj.id,
-            "project_id": proj.id,
-            "name": proj.name,
-            "localPath": proj.local_path,
-            "language": proj.language,
-            "status": proj.status,
-            "current_analysis_id": proj.current_analysis_id,
-            "currentAnalysisId": proj.current_analysis_id,
-            "created_at": proj.created_at.isoformat() if getattr(proj, 'created_at', None) else None
-        }
-        return resp
-
-    except SQLAlchemyError as e:
-        # 可能是 unique constraint 报错或 DB 问题
-        msg = str(e)
-        if 'unique' in msg.lower() or 'duplicate' in msg.lower():
-            # 尝试返回已存在项（race condition）、用 local_path 再查一次
-            try:
-                existing = repo.get_by_local_path(project.local_path)
-                if existing:
-                    return {
-                        "id": existing.id,
-                        "project_id": existing.id,
-                        "name": existing.name,
-                        "localPath": existing.local_path,
-                        "language": existing.language,
-                        "status": existing.status,
-                        "created_at": existing.created_at.isoformat() if getattr(existing, 'created_at', None) else None
-                    }
-            except Exception:
-                pass
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"error": "bad_request", "message": msg})
-    except Exception as e:
-        msg = str(e)
-        if "redis" in msg.lower() or "broker" in msg.lower() or ( _redis is not None and isinstance(e, _redis.exceptions.RedisError) ) or "connection" in msg.lower():
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail={"error": "dependency_unavailable", "service": "redis", "message": msg}
-            )
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"error": "bad_request", "message": msg})
+                return _remember_project(existing, idem_key, status.HTTP_200_OK)
+        except SQLAlchemyError:
+            pass
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"error": "bad_request", "message": str(e)})
 
 
-@project_router.get("/by-path")
-def get_project_by_path(localPath: str, db: Session = Depends(get_db)):
-    """按 localPath 查询项目，返回 200 + project or 404"""
-    from app.repositories.project_repository import ProjectRepository
-    repo = ProjectRepository(Project, db)
-    proj = repo.get_by_local_path(localPath)
+@project_router.get("/by-path", response_class=ORJSONResponse)
+def get_project_by_path(localPath: str, repo: ProjectRepository = Depends(get_project_repo)):
+    """按 localPath 查询项目，返回 200 + project（仅身份与状态字段）or 404"""
+    proj = repo.get_slim_by_local_path(localPath)
     if not proj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
     return proj
@@ -160,165 +179,291 @@ def get_project_by_path(localPath: str, db: Session = Depends(get_db)):
 # start and clears them on completion.
 
 
-@project_router.get("/{project_id}/current")
-def get_project_current(project_id: int, db: Session = Depends(get_db)):
-    from app.repositories.project_repository import ProjectRepository
-    repo = ProjectRepository(Project, db)
+def _load_current_project(repo: ProjectRepository, project_id: int):
     project = repo.get(project_id)
     if not project:
         raise HTTPException(status_code=404, detail={"error": "not_found", "message": "Project not found"})
     if not project.local_path:
         raise HTTPException(status_code=400, detail={"error": "invalid_project", "message": "Project local path is missing"})
 
-    project_root = Path(project.local_path).expanduser()
-    if project_root.is_file():
-        project_root = project_root.parent
-    if not project_root.exists():
+    project_root = _project_root(project)
+    if project_root is None:
         raise HTTPException(status_code=404, detail={"error": "project_path_missing", "message": "Project local path does not exist"})
+    return project, project_root
 
-    orchestrator = AnalysisOrchestrator()
-    try:
-        analysis_result = asyncio.run(orchestrator.analyze_project(str(project_root)))
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail={"error": "project_path_missing", "message": "Project local path does not exist"})
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail={"error": "analysis_failed", "message": str(exc) or repr(exc)})
-
-    debt_scores = analysis_result.get('debt_scores', {}) or {}
-    filtered_scores: Dict[str, Dict] = {}
-    for key, score_data in debt_scores.items():
-        if _is_supported_file(key, score_data):
-            filtered_scores[key] = score_data
 
-    persisted = _persist_debt_scores(db, project.id, filtered_scores)
+def _save_current_results(
+    db: Session,
+    project: Project,
+    filtered_scores: Dict[str, Dict],
+    background_tasks: BackgroundTasks,
+    analysis_id: str = None,
+) -> Dict:
+    body, persisted = _store_current_results(db, project, filtered_scores, analysis_id=analysis_id)
     if persisted:
-        _write_scan_log(project.id, persisted)
+        # 日志记录的序列化放到响应发送之后，响应只等待数据库提交
+        background_tasks.add_task(_write_scan_log, project.id, persisted)
+    _invalidate_project_cache(project.id)
+    return body
 
-    project.last_analysis_at = datetime.now(timezone.utc)
-    project.status = 'idle'
-    db.add(project)
-    db.commit()
-    db.refresh(project)
 
+def _queue_current_scan(db: Session, project: Project) -> Dict:
+    """已有排队/进行中的分析时直接返回其状态，否则投递后台扫描任务"""
+    if project.status in ('queued', 'analyzing') and project.current_analysis_id:
+        return _current_body(project)
+    try:
+        task_id = ProjectService(db).trigger_current_scan(project.id)
+    except AlreadyAnalyzing:
+        # 并发请求已抢先投递，返回其任务
+        db.refresh(project)
+        return _current_body(project)
+    _invalidate_project_cache(project.id)
     return {
         "id": project.id,
-        "current_analysis_id": project.current_analysis_id,
-        "currentAnalysisId": project.current_analysis_id,
-        "status": project.status
+        "current_analysis_id": task_id,
+        "currentAnalysisId": task_id,
+        "status": "queued"
     }
 
 
+@asynccontextmanager
+async def _current_scan_lock(project_id: int):
+    # 只在事件循环线程中访问，无需线程锁
+    entry = _CURRENT_SCAN_LOCKS.get(project_id)
+    if entry is None:
+        entry = _CURRENT_SCAN_LOCKS[project_id] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _CURRENT_SCAN_LOCKS[project_id]
+
+
+@project_router.get("/{project_id}/current", response_class=ORJSONResponse)
+async def get_project_current(
+    project_id: int,
+    background_tasks: BackgroundTasks,
+    wait: bool = False,
+    repo: ProjectRepository = Depends(get_project_repo),
+):
+    """扫描项目当前代码并持久化结果。
+
+    默认投递到 Celery 分析队列并立即返回任务状态，结果可通过 /analysis/{analysis_id} 轮询；
+    扫描完成后 60 秒内的请求直接返回 Redis 中的结果快照。wait=true 时同步扫描，
+    扫描前抢占项目，已有排队或进行中的分析时返回 423。
+    """
+    if not wait:
+        cached = await run_in_threadpool(_cache_get, _current_snapshot_key(project_id))
+        if cached:
+            return Response(content=cached, media_type="application/json")
+
+    project, project_root = await run_in_threadpool(_load_current_project, repo, project_id)
+    if not wait:
+        return await run_in_threadpool(_queue_current_scan, repo.db, project)
+
+    # 同一进程内的并发扫描排队执行；跨进程（含排队中的后台扫描）由数据库条件抢占把关，抢占失败返回 423
+    async with _current_scan_lock(project_id):
+        service = ProjectService(repo.db)
+        analysis_id = await run_in_threadpool(service.claim_current_scan, project_id)
+        _invalidate_project_cache(project_id)
+        orchestrator = get_orchestrator()
+        try:
+            analysis_result = await orchestrator.analyze_project(str(project_root))
+        except Exception as exc:
+            await run_in_threadpool(service.release_claim, project_id, analysis_id)
+            _invalidate_project_cache(project_id)
+            if isinstance(exc, FileNotFoundError):
+                raise HTTPException(status_code=404, detail={"error": "project_path_missing", "message": "Project local path does not exist"})
+            raise HTTPException(status_code=500, detail={"error": "analysis_failed", "message": str(exc) or repr(exc)})
+
+        filtered_scores = _filter_supported_scores(analysis_result.get('debt_scores', {}) or {})
+        return await run_in_threadpool(
+            _save_current_results, repo.db, project, filtered_scores, background_tasks, analysis_id
+        )
+
+
 @project_router.get("/", response_model=List[ProjectResponse])
 def list_projects(
+        after_id: int | None = None,
         skip: int = 0,
         limit: int = 100,
-        db: Session = Depends(get_db)
+        repo: ProjectRepository = Depends(get_project_repo)
 ):
-    """获取项目列表"""
-    from app.repositories.project_repository import ProjectRepository
-    repo = ProjectRepository(Project, db)
-    projects = repo.db.query(Project).offset(skip).limit(limit).all()
-    return projects
+    """获取项目列表。推荐使用 after_id 游标分页，下一页游标通过 X-Next-After-Id 头返回。
 
-
-@project_router.get("/{project_id}", response_model=ProjectResponse)
-def get_project(project_id: int, db: Session = Depends(get_db)):
-    """获取单个项目详情"""
-    from app.repositories.project_repository import ProjectRepository
-    repo = ProjectRepository(Project, db)
-    project = repo.get(project_id)
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="项目不存在"
-        )
-    return project
+    结果按 LIST_STREAM_BATCH 行一批从数据库游标读取并逐行序列化输出，内存占用与页大小无关。
+    """
+    headers = {}
+    count, last_id = repo.page_bounds(after_id, limit, skip=skip)
+    # 请求的 Session 要等响应体发送完才由 get_db 关闭；这里提前归还连接，流式读取期间只占用一个连接
+    repo.db.close()
+    if count == limit and last_id is not None:
+        headers["X-Next-After-Id"] = str(last_id)
+    # 只取 ProjectResponse 需要的列（Core 行，不构造 ORM 实例）
+    stmt = ProjectRepository.page_statement(after_id, limit, skip=skip).with_only_columns(*_LIST_COLUMNS)
+    return StreamingResponse(_stream_projects(stmt), media_type="application/json", headers=headers)
+
+
+def _stream_projects(stmt):
+    # 请求的 Session 可能在响应发送前关闭，流式读取使用独立的会话
+    db = SessionLocal()
+    try:
+        yield b'['
+        first = True
+        rows = db.execute(stmt.execution_options(stream_results=True, yield_per=LIST_STREAM_BATCH)).mappings()
+        for row in rows:
+            if not first:
+                yield b','
+            first = False
+            yield ProjectResponse.model_validate(dict(row)).model_dump_json(by_alias=True).encode()
+        yield b']'
+    finally:
+        db.close()
 
 
-@project_router.post("/{project_id}/analysis", status_code=status.HTTP_202_ACCEPTED)
-def trigger_analysis(project_id: int, payload: dict = Body(default={}), db: Session = Depends(get_db)):
+@project_router.get("/{project_id}", response_model=ProjectResponse)
+def get_project(
+        project_id: int,
+        fields: Literal['slim'] | None = None,
+        repo: ProjectRepository = Depends(get_project_repo),
+        if_none_match: str | None = Header(default=None, alias="If-None-Match")
+):
+    """获取单个项目详情。响应带强 ETag，If-None-Match 命中时返回 304；fields=slim 只返回身份与状态字段"""
+    cache_key = (project_id, fields)
+    with _PROJECT_CACHE_LOCK:
+        cached = _PROJECT_CACHE.get(cache_key)
+    if cached is None:
+        project = repo.get_slim(project_id) if fields else repo.get(project_id)
+        if not project:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="项目不存在"
+            )
+        if fields:
+            body = ProjectSlimResponse.model_validate(project).model_dump_json(by_alias=True).encode()
+        else:
+            body = _project_json(project).encode()
+        etag = '"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest()
+        cached = (etag, body)
+        with _PROJECT_CACHE_LOCK:
+            _PROJECT_CACHE[cache_key] = cached
+
+    etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={PROJECT_CACHE_TTL_SECONDS}"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@project_router.post("/{project_id}/analysis", status_code=status.HTTP_202_ACCEPTED, response_class=ORJSONResponse)
+def trigger_analysis(
+        project_id: int,
+        payload: TriggerAnalysisRequest | None = Body(default=None),
+        db: Session = Depends(get_db)
+):
     """触发项目分析。接受可选 body {"file_path": "..."}，立即返回 analysis_id/status/message。"""
     service = ProjectService(db)
-    try:
-        file_path = payload.get("file_path") if isinstance(payload, dict) else None
-        analysis_id = service.trigger_analysis(project_id, file_path=file_path)
-        return {"analysis_id": analysis_id, "status": "pending", "message": "analysis queued"}
-    except Exception as e:
-        # 更语义化的错误映射
-        msg = str(e)
-        if 'already_analyzing' in msg:
-            # 项目正在被分析/处理，返回统一的中文提示，便于前端展示友好信息
-            # 使用 423 (Locked) 更清晰地表达资源被占用的语义
-            code = getattr(status, 'HTTP_423_LOCKED', 423)
-            raise HTTPException(status_code=code, detail={"error": "conflict", "message": "项目正在进行其他处理，请稍后操作"})
-        if 'project_not_found' in msg:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"error": "not_found", "message": "Project not found"})
-        if "redis" in msg.lower() or "broker" in msg.lower():
-            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                                detail={"error": "dependency_unavailable", "service": "redis", "message": msg})
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"error": "bad_request", "message": msg})
-
-
-@project_router.get("/{project_id}/analysis/{analysis_id}")
-def get_analysis_status(project_id: int, analysis_id: str):
-    """查询分析任务状态（基于 Celery AsyncResult，如果可用）。"""
-    from app.tasks.celery_app import celery_app
-    try:
-        async_result = celery_app.AsyncResult(analysis_id)
-        state = async_result.state.lower() if async_result.state else "pending"
-        # map celery states to desired states
-        mapping = {
-            'pending': 'pending',
-            'received': 'pending',
-            'started': 'running',
-            'retry': 'running',
-            'success': 'completed',
-            'failure': 'failed'
-        }
-        status_val = mapping.get(state, state)
-        info = async_result.info or {}
-        response = {
-            "analysis_id": analysis_id,
-            "project_id": project_id,
-            "status": status_val,
-            "progress": info.get('progress') if isinstance(info, dict) else None,
-            "message": info.get('message') if isinstance(info, dict) else None,
-            "started_at": info.get('started_at') if isinstance(info, dict) else None,
-            "finished_at": info.get('finished_at') if isinstance(info, dict) else None,
-        }
-        return response
-    except Exception as e:
-        # 如果是 broker/redis/连接相关的错误，返回 503 表示依赖不可用，便于前端重试或降级处理。
-        msg = str(e)
-        try:
-            # _redis 在模块顶部尝试导入，若成功可用于类型检查
-            if ( _redis is not None and hasattr(_redis, 'exceptions') and isinstance(e, _redis.exceptions.RedisError) ) or 'redis' in msg.lower() or 'broker' in msg.lower() or 'connection' in msg.lower():
-                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                                    detail={"error": "dependency_unavailable", "service": "redis/celery", "message": msg})
-        except Exception:
-            # 报错时继续降级处理为 400
-            pass
+    file_path = payload.file_path if payload is not None else None
+    analysis_id = service.trigger_analysis(project_id, file_path=file_path)
+    _invalidate_project_cache(project_id)
+    return {"analysis_id": analysis_id, "status": "pending", "message": "analysis queued"}
+
+
+def _state_from_meta(meta: Dict):
+    raw_state = meta.get('status')
+    state = raw_state.lower() if raw_state else "pending"
+    # map celery states to desired states
+    status_val = _CELERY_STATE_MAP.get(state, state)
+    info = meta.get('result') or {}
+    return status_val, info
+
+
+def _get_analysis_state(analysis_id: str):
+    """读取任务状态与 info，1 秒内的重复轮询直接命中进程内缓存，不再访问结果后端"""
+    with _ANALYSIS_STATE_LOCK:
+        cached = _ANALYSIS_STATE_CACHE.get(analysis_id)
+    if cached is not None:
+        return cached
+
+    # 一次读取任务 meta 同时得到 state 与 info（AsyncResult.state/.info 对未完成任务各读一次后端）
+    entry = _state_from_meta(celery_app.backend.get_task_meta(analysis_id))
+    with _ANALYSIS_STATE_LOCK:
+        _ANALYSIS_STATE_CACHE[analysis_id] = entry
+    return entry
+
+
+def _get_analysis_states(analysis_ids: List[str]) -> Dict[str, tuple]:
+    """批量读取任务状态：未命中缓存的 id 在 KV 类结果后端（Redis）上用一次 MGET 取回"""
+    states: Dict[str, tuple] = {}
+    with _ANALYSIS_STATE_LOCK:
+        for analysis_id in analysis_ids:
+            cached = _ANALYSIS_STATE_CACHE.get(analysis_id)
+            if cached is not None:
+                states[analysis_id] = cached
+    misses = [i for i in dict.fromkeys(analysis_ids) if i not in states]
+    if not misses:
+        return states
+
+    backend = celery_app.backend
+    if isinstance(backend, BaseKeyValueStoreBackend):
+        keys = [backend.get_key_for_task(i) for i in misses]
+        values = backend.mget(keys)
+        if hasattr(values, 'get'):
+            # memcached 等客户端返回 key -> value 字典，Redis 返回与 keys 对齐的列表
+            values = [values.get(k) for k in keys]
+        for analysis_id, value in zip(misses, values):
+            meta = backend.decode_result(value) if value else {'status': 'PENDING', 'result': None}
+            states[analysis_id] = _state_from_meta(meta)
+    else:
+        for analysis_id in misses:
+            states[analysis_id] = _state_from_meta(backend.get_task_meta(analysis_id))
+
+    with _ANALYSIS_STATE_LOCK:
+        for analysis_id in misses:
+            _ANALYSIS_STATE_CACHE[analysis_id] = states[analysis_id]
+    return states
+
+
+def _analysis_status_body(project_id: int, analysis_id: str, status_val: str, info) -> Dict:
+    meta = info if isinstance(info, dict) else {}
+    response = {
+        "analysis_id": analysis_id,
+        "project_id": project_id,
+        "status": status_val,
+    }
+    for field in _ANALYSIS_INFO_FIELDS:
+        response[field] = meta.get(field)
+    return response
 
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"error": "bad_request", "message": msg})
 
+@project_router.get("/{project_id}/analysis/{analysis_id}", response_class=ORJSONResponse)
+def get_analysis_status(project_id: int, analysis_id: str):
+    """查询分析任务状态（基于 Celery AsyncResult，如果可用）。broker 不可用时由全局异常处理返回 503"""
+    status_val, info = _get_analysis_state(analysis_id)
+    return _analysis_status_body(project_id, analysis_id, status_val, info)
+
+
+@project_router.post("/{project_id}/analysis/status", response_class=ORJSONResponse)
+def get_analysis_statuses(project_id: int, payload: AnalysisStatusBatchRequest):
+    """批量查询多个分析任务状态，返回顺序与请求的 ids 一致；供同时轮询多个任务的前端使用"""
+    states = _get_analysis_states(payload.ids)
+    return [
+        _analysis_status_body(project_id, analysis_id, *states[analysis_id])
+        for analysis_id in payload.ids
+    ]
 
-@project_router.get("/{project_id}/debt-summary")
+
+@project_router.get("/{project_id}/debt-summary", response_class=ORJSONResponse)
 def get_debt_summary(project_id: int, db: Session = Depends(get_db)):
     """获取项目债务摘要"""
-    service = ProjectService(db)
-    try:
-        raw = service.get_project_debt_summary(project_id)
-        # 标准化为前端期望的结构
-        by_severity = raw.get('by_severity', {})
-        # 汇总 by_status 目前服务端未维护，返回空字典或可从 debt repository 补充
-        return {
-            "project_id": project_id,
-            "total": raw.get('total_debts', 0),
-            "by_severity": by_severity,
-            "by_status": {}
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"获取债务摘要失败: {str(e)}"
-        )
+    raw = ProjectService(db).get_project_debt_summary(project_id)
+    # 标准化为前端期望的结构；数据库异常交给全局处理器映射为 503
+    return {
+        "project_id": project_id,
+        "total": raw.get('total_debts', 0),
+        "by_severity": raw.get('by_severity', {}),
+        "by_status": raw.get('by_status', {})
+    }
@@ -1,4 +1,5 @@
 # app/core/config.py
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -11,9 +12,26 @@ class Settings(BaseSettings):
     # 数据库配置
     DATABASE_URL: str
     TEST_DATABASE_URL: Optional[str] = None
+    MIGRATION_DATABASE_URL: Optional[str] = None  # 迁移脚本用的直连地址；未设置时由 DATABASE_URL 推导（见 script_engine）
+    # 连接池：按预期并发调整；前置 PgBouncer（transaction 模式）时可适当调小
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30      # 等待空闲连接的秒数
+    DB_POOL_RECYCLE: int = 1800    # 连接最长复用秒数，避免被服务端/中间件回收的陈旧连接
+    DB_POOL_PRE_PING: bool = False  # 每次借出连接前 SELECT 1；默认依赖 recycle，数据库常重启时可开启
+    DB_CONNECT_TIMEOUT: int = 5     # PostgreSQL 建连超时秒数
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = None  # PostgreSQL statement_timeout；PgBouncer 通常不转发 options 启动参数
 
     # Redis配置
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 50  # 进程内共享连接池上限
+
+    # Celery worker：分析任务耗时长、内存占用高，定期回收子进程
+    CELERY_WORKER_MAX_TASKS_PER_CHILD: int = 50
+    CELERY_WORKER_MAX_MEMORY_PER_CHILD: int = 500000  # KB
+
+    # 扫描日志每批写入后是否 fsync；默认只 flush 到操作系统缓冲
+    LOG_FSYNC: bool = False
 
     # 安全配置
     SECRET_KEY: str
@@ -27,4 +45,10 @@ class Settings(BaseSettings):
         env_file = ".env"
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """进程内只解析一次 .env / 环境变量；可作为 Depends 注入，测试中用 dependency_overrides 替换"""
+    return Settings()
+
+
+settings = get_settings()
\ No newline at end of file
@@ -1,20 +1,90 @@
 # app/core/database.py
+import logging
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# 连接池容量；同步路由在线程池中执行，线程池并发上限与其对齐（见 main.py startup）
+POOL_SIZE = settings.DB_POOL_SIZE
+MAX_OVERFLOW = settings.DB_MAX_OVERFLOW
+
+# PostgreSQL 专用连接参数：建连超时与可选的语句超时
+_connect_args = {}
+if make_url(settings.DATABASE_URL).get_backend_name() == 'postgresql':
+    _connect_args['connect_timeout'] = settings.DB_CONNECT_TIMEOUT
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        _connect_args['options'] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
 
 # 创建数据库引擎
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_size=10,           # 连接池大小
-    max_overflow=20,        # 最大溢出连接数
-    pool_pre_ping=True,     # 连接前ping检查
+    pool_size=POOL_SIZE,                        # 连接池大小
+    max_overflow=MAX_OVERFLOW,                  # 最大溢出连接数
+    pool_timeout=settings.DB_POOL_TIMEOUT,      # 等待连接超时
+    pool_recycle=settings.DB_POOL_RECYCLE,      # 连接回收周期
+    pool_pre_ping=settings.DB_POOL_PRE_PING,    # 连接前ping检查（默认关闭，省去每次借出的一次往返）
+    pool_use_lifo=True,                         # 优先复用最近归还的连接，空闲连接自然老化回收
+    connect_args=_connect_args,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# 事务模式连接池（Supabase / PgBouncer 常用 6543）不适合跑 DDL 与长会话，迁移脚本改连 5432
+TRANSACTION_POOLER_PORT = 6543
+DIRECT_PORT = 5432
+
+
+def _script_url():
+    """迁移脚本的连接地址：优先 MIGRATION_DATABASE_URL，否则绕开 DATABASE_URL 上的事务模式连接池"""
+    if settings.MIGRATION_DATABASE_URL:
+        return make_url(settings.MIGRATION_DATABASE_URL)
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() == 'postgresql' and url.port == TRANSACTION_POOLER_PORT:
+        direct = url.set(port=DIRECT_PORT)
+        logger.warning(
+            "DATABASE_URL points at a transaction pooler, using %s instead of %s for scripts",
+            direct.render_as_string(hide_password=True),
+            url.render_as_string(hide_password=True),
+        )
+        return direct
+    return url
+
+
+def script_engine(**kwargs):
+    """一次性脚本用的引擎：连接池固定为 1 个连接，脚本内多次 begin() 复用同一连接。
+
+    statement_timeout 显式置 0，避免较长的 DDL 被中断；用完请 dispose()。
+    """
+    url = _script_url()
+    connect_args = {}
+    if url.get_backend_name() == 'postgresql':
+        connect_args = {'connect_timeout': settings.DB_CONNECT_TIMEOUT, 'options': '-c statement_timeout=0'}
+    if url.get_driver_name() == 'psycopg2':
+        # 回填脚本的 conn.execute(text("UPDATE ..."), [dict, ...]) 按页批量发送，而非逐行往返；
+        # 新增数据迁移请传参数列表，不要在 Python 循环里逐行 execute
+        kwargs.setdefault('executemany_mode', 'values_plus_batch')
+        kwargs.setdefault('executemany_batch_page_size', 500)
+    return create_engine(
+        url,
+        pool_size=1,
+        max_overflow=0,
+        connect_args=connect_args,
+        **kwargs,
+    )
+
+
+def script_session() -> Session:
+    """脚本用的独立会话，绑定到 script_engine()"""
+    return Session(script_engine())
+
+
 def get_db():
     """数据库会话依赖注入"""
     db = SessionLocal()
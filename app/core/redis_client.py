@@ -0,0 +1,30 @@
+# app/core/redis_client.py
+from app.core.config import settings
+
+try:
+    import redis as _redis
+except Exception:
+    _redis = None
+
+# 缓存类读写均为尽力而为：超时设短，Redis 不可用时调用方直接回退到数据库
+REDIS_CACHE_TIMEOUT = 0.5
+
+# 未安装 redis 包时为空元组：isinstance / except 均不会匹配
+RedisError = _redis.exceptions.RedisError if _redis is not None else ()
+
+# 进程内共享一个连接池，导入时构建（不会立即建立连接）；
+# health_check_interval 让空闲连接复用前先校验，避免拿到被服务端关闭的连接
+_pool = _redis.ConnectionPool.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=REDIS_CACHE_TIMEOUT,
+    socket_connect_timeout=REDIS_CACHE_TIMEOUT,
+    health_check_interval=30,
+) if _redis is not None else None
+
+redis_client = _redis.Redis(connection_pool=_pool) if _pool is not None else None
+
+
+def get_redis():
+    """返回进程内共享的 Redis 客户端；未安装 redis 包时返回 None。可作为 Depends 注入以便替换"""
+    return redis_client
@@ -0,0 +1,23 @@
+# app/core/responses.py
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson as _orjson
+except Exception:
+    _orjson = None
+
+
+class ORJSONResponse(JSONResponse):
+    """使用 orjson 序列化的 JSON 响应；datetime 等类型由 orjson 原生处理，未安装 orjson 时退回标准库
+
+    只用于没有 response_model 的路由：声明了 response_model 的路由保持默认响应类，
+    新版 FastAPI 会直接经 Pydantic 序列化为 JSON 字节，比任何自定义响应类都快。
+    """
+
+    def render(self, content: Any) -> bytes:
+        if _orjson is not None:
+            return _orjson.dumps(content, option=_orjson.OPT_NON_STR_KEYS | _orjson.OPT_SERIALIZE_NUMPY)
+        return super().render(jsonable_encoder(content))
@@ -1,5 +1,5 @@
 # app/models/debt.py
-from sqlalchemy import Integer, ForeignKey, String, Text, JSON, Column
+from sqlalchemy import Integer, ForeignKey, String, Text, JSON, Column, Index
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel
@@ -7,9 +7,15 @@ from app.models.base import BaseModel
 
 class TechnicalDebt(BaseModel):
     __tablename__ = "technical_debts"
+    __table_args__ = (
+        Index('ix_debt_proj_norm', 'project_id', 'file_path_normalized'),
+        # 债务摘要按 (severity, status) 分组、高危债务按 severity 过滤，均限定 project_id
+        Index('ix_debt_project_severity', 'project_id', 'severity', 'status'),
+    )
 
     project_id = Column(Integer, ForeignKey("projects.id"))
     file_path = Column(String(500))
+    file_path_normalized = Column(String(500))  # 写入时规范化，供按路径查询走索引
     line = Column(Integer, nullable=True)
     debt_type = Column(String(50))  # 'complexity', 'duplication', 'smell', 'todo'
     severity = Column(String(20))  # 'low', 'medium', 'high', 'critical'
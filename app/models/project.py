@@ -1,5 +1,5 @@
 # app/models/project.py
-from sqlalchemy import Column, String, Text, JSON, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, String, Text, JSON, ForeignKey, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 
 from app.models.analysis import CodeAnalysis
@@ -10,12 +10,14 @@ class Project(BaseModel):
     __tablename__ = "projects"
     __table_args__ = (
         UniqueConstraint('local_path', name='uq_projects_local_path'),
+        Index('uq_projects_local_path_norm', 'local_path_norm', unique=True),
     )
 
     name = Column(String(255), nullable=False)
     description = Column(Text)
     repo_url = Column(String(500))
     local_path = Column(String(500))
+    local_path_norm = Column(String(500))  # 写入时规范化，供按路径去重查询走唯一索引
     language = Column(String(50))
 
     # Status and analysis tracking fields
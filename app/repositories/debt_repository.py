@@ -1,11 +1,31 @@
 # app/repositories/debt_repository.py
-from typing import List, Type
+import os
+from functools import lru_cache
+from typing import List, Optional, Type
 
 from app.models.debt import TechnicalDebt
-from sqlalchemy import and_
+from sqlalchemy import and_, func, insert, select
 
 from app.repositories.base import BaseRepository
 
+# 批量插入每批行数
+INSERT_BATCH_SIZE = 1000
+
+# 进程内不变，路径规范化的结果可以安全缓存
+IS_NT = os.name == 'nt'
+
+
+@lru_cache(maxsize=4096)
+def _normalize_path(p: str) -> Optional[str]:
+    """file_path_normalized 列使用的规范化：normpath, 反斜杠转 '/', 去尾斜杠, Windows 下小写"""
+    if not p:
+        return p
+    p = os.path.normpath(p)
+    p = p.replace('\\', '/').rstrip('/')
+    if IS_NT:
+        p = p.lower()
+    return p
+
 
 class DebtRepository(BaseRepository[TechnicalDebt]):
     def get_by_project(self, project_id: int) -> list[Type[TechnicalDebt]]:
@@ -19,4 +39,27 @@ class DebtRepository(BaseRepository[TechnicalDebt]):
                 TechnicalDebt.project_id == project_id,
                 TechnicalDebt.severity.in_(['high', 'critical'])
             )
-        ).all()
\ No newline at end of file
+        ).all()
+
+    def get_by_normalized_paths(self, project_id: int, normalized_paths: List[str]) -> list[Type[TechnicalDebt]]:
+        return self.db.query(TechnicalDebt).filter(
+            TechnicalDebt.project_id == project_id,
+            TechnicalDebt.file_path_normalized.in_(normalized_paths)
+        ).all()
+
+    def count_by_severity_and_status(self, project_id: int):
+        """单次 GROUP BY 聚合：返回 (severity, status, count, effort_sum) 行"""
+        stmt = select(
+            TechnicalDebt.severity,
+            TechnicalDebt.status,
+            func.count(),
+            func.coalesce(func.sum(TechnicalDebt.estimated_effort), 0),
+        ).where(
+            TechnicalDebt.project_id == project_id
+        ).group_by(TechnicalDebt.severity, TechnicalDebt.status)
+        return self.db.execute(stmt).all()
+
+    def bulk_insert(self, rows: List[dict]) -> None:
+        """按批执行 Core insert（executemany），不经过 ORM 对象；由调用方提交事务"""
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            self.db.execute(insert(TechnicalDebt), rows[i:i + INSERT_BATCH_SIZE])
@@ -1,12 +1,18 @@
 # app/repositories/project_repository.py
-from typing import Optional, List, Type
+from functools import lru_cache
+from typing import Optional, List, Tuple, Type
 import os
 
 from app.models.project import Project
 from app.repositories.base import BaseRepository
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.orm import load_only
 
 
+@lru_cache(maxsize=4096)
 def _normalize_path(p: str) -> Optional[str]:
     if not p:
         return p
@@ -19,24 +25,123 @@ def _normalize_path(p: str) -> Optional[str]:
     return p
 
 
+# 身份与状态列：只需定位项目时使用，不读取 description 等大字段
+SLIM_COLUMNS = (
+    Project.id,
+    Project.name,
+    Project.local_path,
+    Project.language,
+    Project.status,
+    Project.current_analysis_id,
+    Project.created_at,
+)
+
+
+# 支持 INSERT ... ON CONFLICT DO NOTHING 的方言 -> insert 构造器
+_UPSERT_INSERTS = {'postgresql': pg_insert, 'sqlite': sqlite_insert}
+
+
 class ProjectRepository(BaseRepository[Project]):
     def get_by_name(self, name: str) -> list[Project]:
         return self.db.query(Project).filter(Project.name == name).first()
 
-    def get_by_local_path(self, local_path: str):
-        """查找时对路径做归一化：normpath, 替换反斜杠, 去尾斜杠, Windows 下忽略大小写"""
+    def get_by_local_path(self, local_path: str) -> Optional[Project]:
+        """查找时对路径做归一化：normpath, 替换反斜杠, 去尾斜杠, Windows 下忽略大小写。
+
+        local_path_norm 在写入时按同一规则计算，这里直接走唯一索引做等值查找。
+        """
+        norm = _normalize_path(local_path)
+        if norm is None:
+            return None
+        return self.db.scalars(select(Project).where(Project.local_path_norm == norm)).first()
+
+    def get_slim(self, id: int) -> Optional[Project]:
+        """按主键取项目，仅加载 SLIM_COLUMNS；访问其他属性会触发额外查询"""
+        stmt = select(Project).options(load_only(*SLIM_COLUMNS)).where(Project.id == id)
+        return self.db.scalars(stmt).first()
+
+    def get_slim_by_local_path(self, local_path: str) -> Optional[Project]:
+        """同 get_by_local_path，仅加载 SLIM_COLUMNS"""
         norm = _normalize_path(local_path)
         if norm is None:
             return None
+        stmt = select(Project).options(load_only(*SLIM_COLUMNS)).where(Project.local_path_norm == norm)
+        return self.db.scalars(stmt).first()
+
+    def create(self, obj_in: dict) -> Project:
+        """INSERT ... RETURNING 一次取回主键与 created_at 等服务端默认值，省去 commit 后的 refresh 回查。
+
+        返回的对象在提交前已与会话分离，提交不会使其属性过期，序列化时不再触发 SELECT；
+        不支持 RETURNING 的数据库回退到 add/commit/refresh。
+        """
+        obj_in = {**obj_in, 'local_path_norm': _normalize_path(obj_in.get('local_path'))}
+        if not self.db.get_bind().dialect.insert_returning:
+            return super().create(obj_in)
+        obj = self.db.scalars(insert(Project).returning(Project), [obj_in]).one()
+        self.db.expunge(obj)
+        self.db.commit()
+        return obj
+
+    def create_or_get_by_local_path(self, obj_in: dict) -> Tuple[Project, bool]:
+        """按规范化路径去重创建，返回 (project, created)。
+
+        INSERT ... ON CONFLICT (local_path_norm) DO NOTHING RETURNING：新建只需一次往返，
+        路径已存在时不报错、不返回行，再按路径查出已有项目。不支持的方言回退到先查后插。
+        """
+        norm = _normalize_path(obj_in.get('local_path'))
+        make_insert = _UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+        if not norm or make_insert is None:
+            return self._get_or_create(obj_in, norm)
+
+        stmt = (
+            make_insert(Project)
+            .values(**obj_in, local_path_norm=norm)
+            .on_conflict_do_nothing(index_elements=['local_path_norm'])
+            .returning(Project)
+        )
+        try:
+            obj = self.db.scalars(stmt).first()
+        except ProgrammingError:
+            # 迁移发现重复路径时只建了普通索引 ix_projects_local_path_norm，ON CONFLICT 找不到唯一约束
+            self.db.rollback()
+            return self._get_or_create(obj_in, norm)
+        if obj is None:
+            self.db.rollback()
+            return self.get_by_local_path(obj_in.get('local_path')), False
+        self.db.expunge(obj)
+        self.db.commit()
+        return obj, True
+
+    def _get_or_create(self, obj_in: dict, norm: Optional[str]) -> Tuple[Project, bool]:
+        """先查后插，供 create_or_get_by_local_path 在无法使用 ON CONFLICT 时回退"""
+        existing = self.get_by_local_path(obj_in.get('local_path')) if norm else None
+        if existing:
+            return existing, False
+        return self.create(obj_in), True
+
+    def update(self, id: int, obj_in: dict) -> Optional[Project]:
+        if 'local_path' in obj_in:
+            obj_in = {**obj_in, 'local_path_norm': _normalize_path(obj_in['local_path'])}
+        return super().update(id, obj_in)
+
+    @staticmethod
+    def page_statement(after_id: Optional[int], limit: int, skip: int = 0):
+        """按主键顺序分页：给出 after_id 时走 keyset（id > after_id），只扫描 limit 行"""
+        stmt = select(Project).order_by(Project.id).limit(limit)
+        if after_id is not None:
+            stmt = stmt.where(Project.id > after_id)
+        elif skip:
+            # 兼容旧的 skip 参数，深分页时仍需扫描并丢弃 skip 行
+            stmt = stmt.offset(skip)
+        return stmt
+
+    def list_page(self, after_id: Optional[int], limit: int, skip: int = 0) -> List[Project]:
+        return list(self.db.scalars(self.page_statement(after_id, limit, skip)))
 
-        # Compare normalized values; for portability we lower both sides on Windows
-        if os.name == 'nt':
-            # Use SQL lower() for DB side lowercasing and trim trailing slashes
-            db_expr = func.lower(func.rtrim(func.replace(Project.local_path, '\\', '/'), '/'))
-            return self.db.query(Project).filter(db_expr == norm).first()
-        else:
-            db_expr = func.rtrim(func.replace(Project.local_path, '\\', '/'), '/')
-            return self.db.query(Project).filter(db_expr == norm).first()
+    def page_bounds(self, after_id: Optional[int], limit: int, skip: int = 0):
+        """返回该页的 (行数, 最大 id)；只扫描主键索引，供流式响应提前给出下一页游标"""
+        ids = self.page_statement(after_id, limit, skip).with_only_columns(Project.id).subquery()
+        return self.db.execute(select(func.count(), func.max(ids.c.id))).one()
 
     def list_active(self) -> list[Type[Project]]:
         return self.db.query(Project).all()
\ No newline at end of file
@@ -1,8 +1,8 @@
 # app/schemas/analysis_schemas.py
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class AnalysisBase(BaseModel):
@@ -16,6 +16,16 @@ class AnalysisCreate(AnalysisBase):
     pass
 
 
+class TriggerAnalysisRequest(BaseModel):
+    """触发分析请求模式（请求体可省略）"""
+    file_path: Optional[str] = Field(None, min_length=1, description="仅分析该文件（可选）")
+
+
+class AnalysisStatusBatchRequest(BaseModel):
+    """批量查询分析状态请求模式"""
+    ids: List[str] = Field(..., min_length=1, max_length=100, description="analysis_id 列表")
+
+
 class AnalysisResponse(AnalysisBase):
     """分析响应模式"""
     id: int
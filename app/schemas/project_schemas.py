@@ -48,3 +48,16 @@ class ProjectResponse(ProjectBase):
     last_analysis_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ProjectSlimResponse(BaseModel):
+    """项目精简响应（身份与状态字段，camelCase 别名），对应 GET /projects/{id}?fields=slim"""
+    model_config = ConfigDict(alias_generator=_to_camel, populate_by_name=True, from_attributes=True)
+
+    id: int
+    name: str
+    local_path: Optional[str] = None
+    language: Optional[str] = None
+    status: Optional[str] = None
+    current_analysis_id: Optional[str] = None
+    created_at: datetime
@@ -1,6 +1,7 @@
 import asyncio
 import os
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Optional
 
@@ -9,6 +10,14 @@ from app.analysis.debt_calculator import TechnicalDebtCalculator
 from app.analysis.git_analyzer import GitHistoryAnalyzer
 
 
+@lru_cache(maxsize=8192)
+def _normalize_key_cached(value: str, is_nt: bool) -> str:
+    # 同一批路径在每次过滤中反复出现；无反斜杠、无尾斜杠的常见情况跳过 replace/rstrip
+    if '\\' in value or value.endswith('/'):
+        value = value.replace('\\', '/').rstrip('/')
+    return value.lower() if is_nt else value
+
+
 class AnalysisOrchestrator:
     """分析协调器"""
 
@@ -16,6 +25,7 @@ class AnalysisOrchestrator:
         self.git_analyzer = GitHistoryAnalyzer()
         self.complexity_analyzer = CodeComplexityAnalyzer()
         self.debt_calculator = TechnicalDebtCalculator()
+        self._is_nt = os.name == 'nt'
 
     async def analyze_project(self, project_path: str, file_path: Optional[str] = None) -> Dict:
         """执行完整项目分析。可选传入 file_path 以仅分析单个文件。"""
@@ -30,20 +40,18 @@ class AnalysisOrchestrator:
             resolved_project_root = project_path
         elif file_path:
             try:
-                resolved_project_root = str(Path(file_path).resolve().parent)
+                resolved_project_root = os.path.dirname(os.path.abspath(file_path))
             except Exception:
                 resolved_project_root = None
 
-        git_task = asyncio.create_task(self.git_analyzer.analyze(git_target))
-        complexity_task = asyncio.create_task(
+        git_data, complexity_data = await asyncio.gather(
+            self.git_analyzer.analyze(git_target),
             self.complexity_analyzer.analyze(
                 complexity_target,
                 project_root=resolved_project_root,
-            )
+            ),
         )
 
-        git_data, complexity_data = await asyncio.gather(git_task, complexity_task)
-
         target_key = None
         if file_path:
             target_key = self._derive_relative_key(git_target, file_path)
@@ -77,34 +85,52 @@ class AnalysisOrchestrator:
 
             if isinstance(value, dict):
                 alt = value.get('relative_path') or value.get('absolute_path')
-                if alt and self._normalize_key(alt) == normalized_target:
-                    filtered[key] = value
-                    continue
+            else:
+                alt = getattr(value, 'relative_path', None) or getattr(value, 'absolute_path', None)
+            if alt and self._normalize_key(alt) == normalized_target:
+                filtered[key] = value
 
         return filtered
 
     def _derive_relative_key(self, project_path: str, file_path: str) -> Optional[str]:
+        # 纯字面规范化（abspath 内含 normpath），不像 Path.resolve() 那样逐级 stat 解析符号链接
         try:
-            file_resolved = Path(file_path).resolve()
+            file_abs = os.path.abspath(file_path)
         except Exception:
             return None
 
         if project_path:
-            root = Path(project_path).resolve()
-            if root.is_file():
-                root = root.parent
-            try:
-                relative = file_resolved.relative_to(root)
-                return self._normalize_key(relative.as_posix())
-            except ValueError:
-                pass
-
-        return self._normalize_key(file_resolved.as_posix())
+            root = os.path.abspath(project_path)
+            if os.path.isfile(root):
+                root = os.path.dirname(root)
+            relative = self._relative_within(file_abs, root)
+            if relative is None:
+                # 调用方可能传入已 resolve 的文件路径而根目录经过符号链接：仅此时两侧都 realpath 后再比较
+                relative = self._relative_within(os.path.realpath(file_abs), os.path.realpath(root))
+            if relative is not None:
+                return self._normalize_key(relative)
+
+        return self._normalize_key(file_abs)
+
+    @staticmethod
+    def _relative_within(file_abs: str, root: str) -> Optional[str]:
+        """file_abs 位于 root 之下时返回相对路径，否则返回 None"""
+        try:
+            relative = os.path.relpath(file_abs, root)
+        except ValueError:
+            # Windows 下不同盘符
+            return None
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return None
+        return relative
 
     def _normalize_key(self, value: str) -> str:
         if not value:
             return ''
-        normalized = str(value).replace('\\', '/').rstrip('/')
-        if os.name == 'nt':
-            normalized = normalized.lower()
-        return normalized
\ No newline at end of file
+        return _normalize_key_cached(str(value), self._is_nt)
+
+
+@lru_cache(maxsize=1)
+def get_orchestrator() -> AnalysisOrchestrator:
+    """进程内共享的分析协调器；各分析器不持有实例状态，可在线程与协程间共用"""
+    return AnalysisOrchestrator()
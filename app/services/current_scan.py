@@ -0,0 +1,241 @@
+# app/services/current_scan.py
+"""/current 扫描结果的过滤、持久化与快照缓存。
+
+API 的 wait=true 同步扫描与 Celery 的 scan_project_current_task 共用这里的实现，任务层不依赖 API 模块。
+"""
+import json
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.redis_client import get_redis
+from app.models.debt import TechnicalDebt
+from app.models.project import Project
+from app.repositories.debt_repository import IS_NT, DebtRepository, _normalize_path
+
+try:
+    import orjson as _orjson
+except Exception:
+    _orjson = None
+
+logger = logging.getLogger(__name__)
+
+# /current 后台扫描完成后写入 Redis 的结果快照有效期
+CURRENT_SNAPSHOT_TTL_SECONDS = 60
+
+SUPPORTED_SUFFIXES = frozenset({
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.go', '.cpp', '.c', '.map', '.json', '.css', '.html'
+})
+_EMPTY: Dict = {}
+
+# IN 列表分批，避免单条 SQL 参数过多
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _is_supported_file(raw_path: str, debt_data: Dict) -> bool:
+    # 每个文件都会调用：直接在字符串上找后缀，不构造 Path / suffixes 列表
+    metrics = debt_data.get('complexity_metrics') or _EMPTY
+    if metrics.get('language'):
+        return True
+
+    for candidate in (metrics.get('absolute_path'), metrics.get('relative_path'), raw_path):
+        if not candidate:
+            continue
+        name = str(candidate).lower()
+        # 与 Path.suffixes 一致：取最后一段文件名，忽略开头的点（隐藏文件）
+        if IS_NT:
+            name = name.replace('\\', '/')
+        name = name.rstrip('/')
+        name = name[name.rfind('/') + 1:]
+        name = name.lstrip('.')
+        dot = name.rfind('.')
+        if dot < 0:
+            continue
+        # '.map' 本身在 SUPPORTED_SUFFIXES 中，.js.map / .ts.map 无需再单独判断
+        if name[dot:] in SUPPORTED_SUFFIXES:
+            return True
+
+    return False
+
+
+def _filter_supported_scores(debt_scores: Dict[str, Dict]) -> Dict[str, Dict]:
+    # 单次推导式 + 局部绑定，大项目上省去逐项的全局查找与 setitem
+    is_supported = _is_supported_file
+    return {key: score_data for key, score_data in debt_scores.items() if is_supported(key, score_data)}
+
+
+def _project_root(project: Project):
+    """项目本地根目录；local_path 指向文件时取其所在目录，路径不存在时返回 None"""
+    project_root = Path(project.local_path).expanduser()
+    if project_root.is_file():
+        project_root = project_root.parent
+    return project_root if project_root.exists() else None
+
+
+def _current_body(project: Project) -> Dict:
+    return {
+        "id": project.id,
+        "current_analysis_id": project.current_analysis_id,
+        "currentAnalysisId": project.current_analysis_id,
+        "status": project.status
+    }
+
+
+def _store_current_results(
+    db: Session,
+    project: Project,
+    filtered_scores: Dict[str, Dict],
+    analysis_id: Optional[str] = None,
+) -> Tuple[Dict, List[Dict]]:
+    """持久化扫描结果并把项目置回 idle，返回 (响应体, 写入扫描日志的条目)；日志由调用方决定同步或延后写入"""
+    persisted = _persist_debt_scores(db, project.id, filtered_scores)
+
+    project.last_analysis_at = datetime.now(timezone.utc)
+    project.status = 'idle'
+    if analysis_id:
+        # 后台扫描任务完成：释放本任务的标记并记录为最近一次分析
+        project.current_analysis_id = None
+        project.last_analysis_id = analysis_id
+    db.commit()
+    db.refresh(project)
+    return _current_body(project), persisted
+
+
+def _current_snapshot_key(project_id: int) -> str:
+    return f"project:{project_id}:current"
+
+
+def _cache_current_snapshot(project_id: int, snapshot: Dict):
+    # 尽力而为：Redis 不可用时 /current 回退为重新投递扫描
+    key = _current_snapshot_key(project_id)
+    try:
+        client = get_redis()
+        if client is not None:
+            client.set(key, json.dumps(snapshot), ex=CURRENT_SNAPSHOT_TTL_SECONDS)
+    except Exception as exc:
+        logger.warning("Redis cache write failed for %s: %s", key, exc)
+
+
+def _persist_debt_scores(db: Session, project_id: int, debt_scores: Dict) -> List[Dict]:
+    persisted: List[Dict] = []
+
+    entries = []
+    for raw_path, debt_data in debt_scores.items():
+        stored_path = _choose_storage_path(raw_path, debt_data)
+        entries.append((stored_path, _normalize_path(stored_path), debt_data))
+
+    # 一次性取回已存在的记录，避免逐个文件查询（N+1）
+    existing_by_norm, existing_by_raw = _fetch_existing_debts(
+        db,
+        project_id,
+        [norm for _, norm, _ in entries if norm],
+        [stored for stored, norm, _ in entries if not norm],
+    )
+
+    # 新记录以字典收集，最后按批走 Core insert（executemany），跳过逐行的 ORM 状态管理
+    new_rows: Dict[tuple, Dict] = {}
+    for stored_path, normalized_lookup, debt_data in entries:
+        values = {
+            'file_path': stored_path,
+            'file_path_normalized': normalized_lookup,
+            'line': debt_data.get('line'),
+            'debt_type': 'hotspot',
+            'severity': debt_data.get('severity', 'low'),
+            'description': f"Technical debt hotspot: {debt_data.get('debt_score', 0.0):.2f} score",
+            'estimated_effort': debt_data.get('estimated_effort'),
+            'project_metadata': _serialize_metadata(debt_data),
+        }
+        if normalized_lookup:
+            existing = existing_by_norm.get(normalized_lookup)
+            key = ('norm', normalized_lookup)
+        else:
+            existing = existing_by_raw.get(stored_path)
+            key = ('raw', stored_path)
+
+        if existing:
+            for field, value in values.items():
+                setattr(existing, field, value)
+        elif key in new_rows:
+            # 同一批次内规范化后重复的路径只插入一次，以最后一次为准
+            new_rows[key].update(values)
+        else:
+            values['project_id'] = project_id
+            new_rows[key] = values
+
+        persisted.append({
+            'file_path': stored_path,
+            'debt_score': debt_data.get('debt_score', 0.0),
+            'severity': debt_data.get('severity', 'low'),
+            'metadata': debt_data,
+            'metadata_json': values['project_metadata'],
+        })
+
+    DebtRepository(TechnicalDebt, db).bulk_insert(list(new_rows.values()))
+    db.commit()
+    return persisted
+
+
+def _fetch_existing_debts(db: Session, project_id: int, normalized_paths: List[str], raw_paths: List[str]):
+    by_norm: Dict[str, TechnicalDebt] = {}
+    by_raw: Dict[str, TechnicalDebt] = {}
+
+    repo = DebtRepository(TechnicalDebt, db)
+    unique_norm = list(dict.fromkeys(normalized_paths))
+    for i in range(0, len(unique_norm), LOOKUP_CHUNK_SIZE):
+        for debt in repo.get_by_normalized_paths(project_id, unique_norm[i:i + LOOKUP_CHUNK_SIZE]):
+            by_norm.setdefault(debt.file_path_normalized, debt)
+
+    unique_raw = list(dict.fromkeys(raw_paths))
+    if unique_raw:
+        rows = (
+            db.query(TechnicalDebt)
+            .filter(TechnicalDebt.project_id == project_id, TechnicalDebt.file_path.in_(unique_raw))
+            .all()
+        )
+        for debt in rows:
+            by_raw.setdefault(debt.file_path, debt)
+
+    return by_norm, by_raw
+
+
+def _serialize_metadata(payload):
+    if payload is None:
+        return None
+    try:
+        if _orjson is not None:
+            return _orjson.dumps(payload, option=_orjson.OPT_NON_STR_KEYS | _orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+        return json.dumps(payload, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return json.dumps(str(payload), ensure_ascii=False)
+
+
+def _choose_storage_path(raw_key: str, debt_data: Dict) -> str:
+    metrics = debt_data.get('complexity_metrics') or {}
+    return _select_storage_path(metrics.get('relative_path'), raw_key, metrics.get('absolute_path'))
+
+
+@lru_cache(maxsize=4096)
+def _select_storage_path(relative_path: Optional[str], raw_key: str, absolute_path: Optional[str]) -> str:
+    candidates = [relative_path, raw_key, absolute_path]
+
+    for candidate in candidates:
+        if candidate:
+            normalized = _normalize_storage_path(candidate)
+            if normalized:
+                return normalized
+
+    return _normalize_storage_path(raw_key)
+
+
+@lru_cache(maxsize=4096)
+def _normalize_storage_path(value: str) -> str:
+    if not value:
+        return ''
+    normalized = str(value).replace('\\', '/').rstrip('/')
+    if IS_NT:
+        normalized = normalized.lower()
+    return normalized
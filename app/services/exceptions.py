@@ -0,0 +1,27 @@
+# app/services/exceptions.py
+"""服务层异常：API 层按类型映射为 HTTP 状态码，不再扫描异常消息字符串。
+
+继承 RuntimeError 并保留原有消息（如 'project_not_found'），兼容仍按 RuntimeError 捕获的调用方。
+"""
+
+
+class ServiceError(RuntimeError):
+    """服务层业务异常基类"""
+
+
+class ProjectNotFound(ServiceError):
+    def __init__(self, message: str = 'project_not_found'):
+        super().__init__(message)
+
+
+class AlreadyAnalyzing(ServiceError):
+    def __init__(self, message: str = 'already_analyzing'):
+        super().__init__(message)
+
+
+class DependencyUnavailable(ServiceError):
+    """Redis / Celery broker 等外部依赖不可用"""
+
+    def __init__(self, message: str, service: str = 'redis'):
+        super().__init__(message)
+        self.service = service
@@ -2,18 +2,30 @@
 from typing import List, Optional, Dict
 import uuid
 
+from kombu.exceptions import OperationalError as KombuOperationalError
+from sqlalchemy import or_, update
+from sqlalchemy.exc import SQLAlchemyError
+
 from app.models.debt import TechnicalDebt
 from app.models.project import Project
 from app.repositories.project_repository import ProjectRepository
 from app.repositories.debt_repository import DebtRepository
-from app.services.analysis_orchestrator import AnalysisOrchestrator
+from app.services.analysis_orchestrator import get_orchestrator
+from app.services.exceptions import AlreadyAnalyzing, DependencyUnavailable, ProjectNotFound, ServiceError
+from app.core.redis_client import RedisError
+from app.tasks.celery_app import ANALYSIS_QUEUE, ANALYZE_PROJECT_TASK, SCAN_PROJECT_CURRENT_TASK, celery_app
+
+# kombu / redis 客户端抛出的连接类异常；API 层全局映射为 503
+BROKER_CLIENT_ERRORS = (KombuOperationalError, RedisError)
+# 投递任务时表示 broker 不可达的异常类型；内置 ConnectionError 只在投递处判断，不做全局映射
+BROKER_ERRORS = BROKER_CLIENT_ERRORS + (ConnectionError,)
 
 
 class ProjectService:
     def __init__(self, db):
         self.project_repo = ProjectRepository(Project, db)
         self.debt_repo = DebtRepository(TechnicalDebt, db)
-        self.analyzer = AnalysisOrchestrator()
+        self.analyzer = get_orchestrator()
 
     def create_project(self, project_data: dict) -> Project:
         """创建新项目"""
@@ -27,75 +39,119 @@ class ProjectService:
     def trigger_analysis(self, project_id: int, file_path: str = None) -> str:
         """触发代码分析（异步）。
 
-        流程：生成 task_id -> apply_async (指定 task_id) -> 在 DB 事务中写 current_analysis_id。
-        如果 DB 写入失败，会尝试 revoke 刚刚入队的任务以避免 dangling task。
+        流程：生成 task_id -> 单条条件 UPDATE 抢占项目（写 current_analysis_id/status）
+        -> send_task 投递到分析队列。投递失败时按 task_id 回滚抢占，避免项目卡在 queued。
         """
-        from app.tasks.analysis_tasks import analyze_project_task
-        from sqlalchemy.exc import SQLAlchemyError
+        return self._claim_and_send(project_id, ANALYZE_PROJECT_TASK, (project_id, file_path))
+
+    def trigger_current_scan(self, project_id: int) -> str:
+        """触发 /current 的后台扫描任务，抢占与投递流程同 trigger_analysis"""
+        return self._claim_and_send(project_id, SCAN_PROJECT_CURRENT_TASK, (project_id,))
+
+    def claim_current_scan(self, project_id: int) -> str:
+        """/current?wait=true 的同步扫描：扫描前抢占项目，返回本次扫描的 analysis_id。
+
+        比投递任务更严格：已有排队（queued）或进行中的分析时都不抢占，避免与排队的后台扫描并行。
+        """
+        task_id = uuid.uuid4().hex
+        self._claim(
+            project_id,
+            task_id,
+            'analyzing',
+            or_(
+                Project.status.is_(None),
+                Project.status.not_in(('queued', 'analyzing')),
+                Project.current_analysis_id.is_(None),
+                Project.current_analysis_id == '',
+            ),
+        )
+        return task_id
+
+    def _claim(self, project_id: int, task_id: str, new_status: str, claimable) -> None:
+        """单条条件 UPDATE 抢占项目；不满足 claimable 时抛 AlreadyAnalyzing，项目不存在时抛 ProjectNotFound"""
         session = self.project_repo.db
+        claim = (
+            update(Project)
+            .where(Project.id == project_id, claimable)
+            .values(current_analysis_id=task_id, status=new_status)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            claimed = session.execute(claim).rowcount
+            if not claimed:
+                session.rollback()
+                # 仅在失败路径上再查一次，区分项目不存在与正在分析
+                exists = session.query(Project.id).filter(Project.id == project_id).first()
+                raise AlreadyAnalyzing() if exists else ProjectNotFound()
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def _claim_and_send(self, project_id: int, task_name: str, args: tuple) -> str:
+        task_id = uuid.uuid4().hex
+        # 已有在跑的分析（analyzing 且 current_analysis_id 非空）时不抢占
+        self._claim(
+            project_id,
+            task_id,
+            'queued',
+            or_(
+                Project.status.is_(None),
+                Project.status != 'analyzing',
+                Project.current_analysis_id.is_(None),
+                Project.current_analysis_id == '',
+            ),
+        )
 
-        task_id = str(uuid.uuid4())
         try:
-            task = analyze_project_task.apply_async(args=(project_id, file_path), task_id=task_id)
+            celery_app.send_task(
+                task_name,
+                args=args,
+                task_id=task_id,
+                queue=ANALYSIS_QUEUE,
+            )
+        except BROKER_ERRORS as e:
+            self.release_claim(project_id, task_id)
+            raise DependencyUnavailable(f"Cannot connect to Redis broker: {e}") from e
         except Exception as e:
-            msg = str(e)
-            try:
-                import redis as _redis
-                if isinstance(e, _redis.exceptions.RedisError) or 'redis' in msg.lower() or 'broker' in msg.lower():
-                    raise RuntimeError(f"Cannot connect to Redis broker: {msg}")
-            except Exception:
-                raise RuntimeError(f"Failed to enqueue analysis task: {msg}")
-
-        # 若发送成功，写入 DB（行级锁以避免并发）
+            self.release_claim(project_id, task_id)
+            # Celery 的 Redis 结果消费者重连失败时抛 RuntimeError(E_RETRY_LIMIT_EXCEEDED)，原始连接错误在 __cause__ 上
+            if isinstance(e.__cause__, BROKER_ERRORS):
+                raise DependencyUnavailable(f"Cannot connect to Redis broker: {e.__cause__}") from e
+            raise ServiceError(f"Failed to enqueue analysis task: {e}") from e
+
+        return task_id
+
+    def release_claim(self, project_id: int, task_id: str):
+        """撤销抢占并把项目置回 idle；仅当 current_analysis_id 仍是本次 task_id 时生效"""
+        session = self.project_repo.db
         try:
-            with session.begin():
-                project = session.query(Project).with_for_update().filter(Project.id == project_id).first()
-                if not project:
-                    # 未找到项目，撤销任务
-                    try:
-                        from app.tasks.celery_app import celery_app
-                        celery_app.control.revoke(task_id, terminate=False)
-                    except Exception:
-                        pass
-                    raise RuntimeError('project_not_found')
-
-                if project.current_analysis_id and project.status == 'analyzing':
-                    # 已有在跑的分析，撤销刚刚创建的任务
-                    try:
-                        from app.tasks.celery_app import celery_app
-                        celery_app.control.revoke(task_id, terminate=False)
-                    except Exception:
-                        pass
-                    raise RuntimeError('already_analyzing')
-
-                project.current_analysis_id = task_id
-                project.status = 'queued'
-                session.add(project)
-            return task_id
-        except Exception:
-            # 如果 DB 写入失败，尝试撤销任务以避免 dangling task
-            try:
-                from app.tasks.celery_app import celery_app
-                celery_app.control.revoke(task_id, terminate=False)
-            except Exception:
-                pass
-            # 将错误上抛，API 层会映射为 503/400/423 等（423 表示 Locked，当项目被分析时使用）
-            raise
+            session.execute(
+                update(Project)
+                .where(Project.id == project_id, Project.current_analysis_id == task_id)
+                .values(current_analysis_id=None, status='idle')
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
 
     def get_project_debt_summary(self, project_id: int) -> Dict:
         """获取项目债务摘要"""
-        debts = self.debt_repo.get_by_project(project_id)
+        rows = self.debt_repo.count_by_severity_and_status(project_id)
 
         summary = {
-            'total_debts': len(debts),
+            'total_debts': 0,
             'by_severity': {},
+            'by_status': {},
             'total_estimated_effort': 0
         }
 
-        for debt in debts:
-            severity = debt.severity
-            summary['by_severity'][severity] = summary['by_severity'].get(severity, 0) + 1
-            est = getattr(debt, 'estimated_effort', 0) or 0
-            summary['total_estimated_effort'] += est
+        # 数据库侧已按 (severity, status) 分组，这里只合并少量聚合行
+        for severity, debt_status, count, effort in rows:
+            summary['by_severity'][severity] = summary['by_severity'].get(severity, 0) + count
+            summary['by_status'][debt_status] = summary['by_status'].get(debt_status, 0) + count
+            summary['total_debts'] += count
+            summary['total_estimated_effort'] += effort or 0
 
-        return summary
\ No newline at end of file
+        return summary
@@ -1,21 +1,38 @@
 import asyncio
+import atexit
 import json
+import os
+import queue
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import List, Optional
 
+from celery.signals import worker_process_init, worker_process_shutdown
 from celery.utils.log import get_task_logger
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.models.debt import TechnicalDebt
 from app.models.project import Project
 from app.tasks.celery_app import celery_app
+from app.core.config import settings
 from app.core.database import SessionLocal
-from app.services.analysis_orchestrator import AnalysisOrchestrator
-from app.repositories.project_repository import ProjectRepository
-from app.repositories.debt_repository import DebtRepository
-
+from app.services.analysis_orchestrator import get_orchestrator
+from app.services.current_scan import (
+    _cache_current_snapshot,
+    _filter_supported_scores,
+    _project_root,
+    _serialize_metadata,
+    _store_current_results,
+)
+from app.repositories.debt_repository import DebtRepository, _normalize_path
 
 logger = get_task_logger(__name__)
 LOG_FILE_PATH = Path(__file__).resolve().parents[2] / 'logs' / 'analysis_scan.log'
+# analyze_project_task 进度上报到结果后端的最小间隔（秒）
+PROGRESS_REPORT_INTERVAL = 0.25
 
 
 def _ensure_log_file():
@@ -30,35 +47,85 @@ def _ensure_log_file():
 _ensure_log_file()
 
 
+# 每个 worker 线程一个常驻事件循环：避免 asyncio.run 每个任务都新建/销毁循环及其默认线程池
+_LOOPS = threading.local()
+
+
+def _run_async(coro):
+    loop = getattr(_LOOPS, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _LOOPS.loop = loop
+    return loop.run_until_complete(coro)
+
+
+@worker_process_init.connect
+def _reset_worker_loop(**_):
+    # prefork 子进程不能沿用父进程 fork 前创建的循环
+    _LOOPS.loop = None
+
+
+@worker_process_shutdown.connect
+def _close_worker_loop(**_):
+    loop = getattr(_LOOPS, 'loop', None)
+    if loop is None or loop.is_closed():
+        return
+    try:
+        loop.run_until_complete(loop.shutdown_default_executor())
+    finally:
+        loop.close()
+        _LOOPS.loop = None
+
+
+def _claim_project(db, project_id: int, task_id: str) -> bool:
+    """单条条件 UPDATE 把项目标记为 analyzing；另一任务已在分析时返回 False。
+    数据库出错时回滚并抛出，调用方不得在未抢占的情况下继续分析"""
+    try:
+        claimed = db.execute(
+            update(Project)
+            .where(
+                Project.id == project_id,
+                or_(
+                    Project.status.is_(None),
+                    Project.status != 'analyzing',
+                    Project.current_analysis_id.is_(None),
+                    Project.current_analysis_id == task_id,
+                ),
+            )
+            .values(current_analysis_id=task_id, status='analyzing')
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return bool(claimed)
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+
+
 @celery_app.task(bind=True)
 def analyze_project_task(self, project_id: int, file_path: str = None):
     """异步分析项目任务"""
+    task_id = getattr(self.request, 'id', None) or getattr(self, 'id', None)
     db = SessionLocal()
     try:
-        project_repo = ProjectRepository(Project, db)
         debt_repo = DebtRepository(TechnicalDebt, db)
 
-        project = project_repo.get(project_id)
+        # 只取分析路径，项目状态的读写都走条件 UPDATE，不加载 ORM 对象
+        project = db.execute(select(Project.local_path).where(Project.id == project_id)).first()
         if not project:
             return {"status": "error", "message": "Project not found"}
 
         # 执行分析
-        orchestrator = AnalysisOrchestrator()
+        orchestrator = get_orchestrator()
         # 如果提供 file_path，则将其作为分析目标（orchestrator 可选择支持）
         target = project.local_path
         if file_path:
             target = file_path
 
-        # 在 DB 中标记 task 正在运行（current_analysis_id/status）
-        try:
-            task_id = getattr(self.request, 'id', None) or getattr(self, 'id', None)
-            if task_id:
-                project.current_analysis_id = task_id
-                project.status = 'analyzing'
-                db.add(project)
-                db.commit()
-        except Exception:
-            db.rollback()
+        # 在 DB 中标记 task 正在运行（current_analysis_id/status）：单条条件 UPDATE，
+        # 另一任务已处于 analyzing 时不覆盖其标记，本任务直接放弃
+        if task_id and not _claim_project(db, project_id, task_id):
+            return {"status": "skipped", "project_id": project_id, "message": "already_analyzing"}
 
         # 更新任务状态到 Celery meta
         try:
@@ -66,31 +133,40 @@ def analyze_project_task(self, project_id: int, file_path: str = None):
         except Exception:
             pass
 
-        analysis_result = asyncio.run(orchestrator.analyze_project(target))
+        analysis_result = _run_async(orchestrator.analyze_project(target))
 
         # 保存债务项目并在每个文件后更新任务进度
-        debt_scores = analysis_result.get('debt_scores', {})
+        # 非字典的评分项无法落库，先整体剔除，循环体内不再逐项判断类型
+        debt_scores = {
+            fpath: debt_data
+            for fpath, debt_data in (analysis_result.get('debt_scores') or {}).items()
+            if isinstance(debt_data, dict)
+        }
         total = max(1, len(debt_scores))
         processed = 0
+        last_progress = -1
+        last_reported_at = 0.0
         collected_scores = []
+        log_entries = []
+        debt_rows = []
         for fpath, debt_data in debt_scores.items():
-            severity = debt_data.get('severity', '') if isinstance(debt_data, dict) else ''
-            debt_score = debt_data.get('debt_score', 0.0) if isinstance(debt_data, dict) else 0.0
+            get = debt_data.get
+            severity = get('severity', '')
+            debt_score = get('debt_score', 0.0)
+            # 元数据只序列化一次，数据库与扫描日志共用
+            metadata_json = _serialize_metadata(debt_data)
             debt_item = {
                 'project_id': project_id,
                 'file_path': fpath,
-                'line': debt_data.get('line') if isinstance(debt_data, dict) else None,
+                'file_path_normalized': _normalize_path(fpath),
+                'line': get('line'),
                 'debt_type': 'hotspot',
                 'severity': severity,
                 'description': f"Technical debt hotspot: {debt_score:.2f} score",
-                'estimated_effort': debt_data.get('estimated_effort'),
-                'project_metadata': _serialize_metadata(debt_data)
+                'estimated_effort': get('estimated_effort'),
+                'project_metadata': metadata_json
             }
-            try:
-                debt_repo.create(debt_item)
-            except Exception:
-                # don't fail whole task on single debt save error
-                pass
+            debt_rows.append(debt_item)
 
             collected_scores.append({
                 'file_path': fpath,
@@ -98,12 +174,24 @@ def analyze_project_task(self, project_id: int, file_path: str = None):
                 'severity': severity,
                 'metadata': debt_data,
             })
+            # 预序列化的元数据只给扫描日志用，不进入任务结果，避免结果后端里每个文件的元数据存两份
+            log_entries.append({
+                'file_path': fpath,
+                'debt_score': debt_score,
+                'severity': severity,
+                'metadata_json': metadata_json,
+            })
             logger.info("Debt score | project=%s | file=%s | score=%.4f | severity=%s", project_id, fpath, debt_score, severity)
 
             processed += 1
-            # 更新 Celery 任务状态进度
+            # 更新 Celery 任务状态进度：每次都写结果后端开销大，仅在百分比变化且距上次
+            # 至少 PROGRESS_REPORT_INTERVAL 秒时上报，最后一个文件总会上报
+            progress = int(processed / total * 100)
+            now = time.monotonic()
+            if processed < total and (progress == last_progress or now - last_reported_at < PROGRESS_REPORT_INTERVAL):
+                continue
+            last_progress, last_reported_at = progress, now
             try:
-                progress = int(processed / total * 100)
                 self.update_state(
                     state='PROGRESS',
                     meta={
@@ -119,19 +207,34 @@ def analyze_project_task(self, project_id: int, file_path: str = None):
             except Exception:
                 pass
 
-        # 标记为完成并返回信息；更新项目表
+        # 标记为完成：单条 UPDATE，不经 ORM 对象；与债务写入放在同一事务中提交
+        finish = (
+            update(Project)
+            .where(Project.id == project_id)
+            .values(
+                current_analysis_id=None,
+                last_analysis_id=task_id,
+                last_analysis_at=datetime.now(),
+                status='idle',
+            )
+            .execution_options(synchronize_session=False)
+        )
         try:
-            task_id = getattr(self.request, 'id', None) or getattr(self, 'id', None)
-            project.current_analysis_id = None
-            project.last_analysis_id = task_id
-            project.last_analysis_at = datetime.now()
-            project.status = 'idle'
-            db.add(project)
+            debt_repo.bulk_insert(debt_rows)
+            db.execute(finish)
             db.commit()
-        except Exception:
+        except SQLAlchemyError:
+            # don't fail whole task on debt save error
             db.rollback()
+            logger.exception("Failed to save debt items for project %s", project_id)
+            # 债务写入失败时仍释放项目标记
+            try:
+                db.execute(finish)
+                db.commit()
+            except SQLAlchemyError:
+                db.rollback()
 
-        _write_scan_log(project_id, collected_scores)
+        _write_scan_log(project_id, log_entries)
 
         return {
             "status": "completed",
@@ -141,21 +244,64 @@ def analyze_project_task(self, project_id: int, file_path: str = None):
         }
 
     except Exception as e:
+        # 分析或抢占失败时释放本任务的标记，避免项目停留在 queued/analyzing 而让后续请求一直 423
+        db.rollback()
+        if task_id:
+            _finish_project(db, project_id, task_id)
         return {"status": "error", "message": str(e)}
     finally:
         db.close()
 
 
-def _serialize_metadata(payload):
-    if payload is None:
-        return None
+@celery_app.task(bind=True)
+def scan_project_current_task(self, project_id: int):
+    """/current 的后台扫描：只保留受支持文件，按路径 upsert 债务，并把结果快照写入 Redis"""
+    task_id = getattr(self.request, 'id', None)
+    db = SessionLocal()
     try:
-        return json.dumps(payload, ensure_ascii=False)
-    except (TypeError, ValueError):
-        return json.dumps(str(payload), ensure_ascii=False)
+        project = db.get(Project, project_id)
+        if not project:
+            return {"status": "error", "message": "Project not found"}
+        project_root = _project_root(project)
+        if project_root is None:
+            _finish_project(db, project_id, task_id)
+            return {"status": "error", "message": "Project local path does not exist"}
+        try:
+            if task_id and not _claim_project(db, project_id, task_id):
+                return {"status": "skipped", "project_id": project_id, "message": "already_analyzing"}
+            analysis_result = _run_async(get_orchestrator().analyze_project(str(project_root)))
+            filtered_scores = _filter_supported_scores(analysis_result.get('debt_scores', {}) or {})
+            snapshot, persisted = _store_current_results(db, project, filtered_scores, analysis_id=task_id)
+        except Exception:
+            db.rollback()
+            _finish_project(db, project_id, task_id)
+            raise
+
+        if persisted:
+            _write_scan_log(project_id, persisted)
+        _cache_current_snapshot(project_id, snapshot)
+        return {"status": "completed", "project_id": project_id, "files": len(filtered_scores)}
+    finally:
+        db.close()
+
+
+def _finish_project(db, project_id: int, task_id: Optional[str]):
+    """扫描失败或无法进行时释放本任务的标记，避免项目停留在 queued/analyzing"""
+    try:
+        db.execute(
+            update(Project)
+            .where(Project.id == project_id, Project.current_analysis_id == task_id)
+            .values(current_analysis_id=None, status='idle')
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        logger.exception("Failed to release project %s after scan", project_id)
 
 
 def _write_scan_log(project_id: int, entries):
+    """把扫描记录序列化为 JSON 行后放入队列，由后台线程批量追加到日志文件，请求线程不直接做文件 IO"""
     if not entries:
         record = {
             'timestamp': datetime.now().isoformat(),
@@ -166,33 +312,136 @@ def _write_scan_log(project_id: int, entries):
             'details': 'No files analyzed or results empty',
         }
         try:
-            with LOG_FILE_PATH.open('a', encoding='utf-8') as log_file:
-                log_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            _enqueue_scan_log([json.dumps(record, ensure_ascii=False) + '\n'])
         except Exception:
             logger.exception("Failed to write empty analysis record")
         return
 
     try:
-        with LOG_FILE_PATH.open('a', encoding='utf-8') as log_file:
-            for entry in entries:
-                details_raw = entry.get('metadata')
-                if details_raw is None:
-                    details = None
-                else:
-                    try:
-                        json.dumps(details_raw, ensure_ascii=False)
-                        details = details_raw
-                    except (TypeError, ValueError):
-                        details = str(details_raw)
-
-                record = {
-                    'timestamp': datetime.now().isoformat(),
-                    'project_id': project_id,
-                    'file_path': entry.get('file_path'),
-                    'debt_score': entry.get('debt_score', 0.0),
-                    'severity': entry.get('severity') or 'low',
-                    'details': details,
-                }
-                log_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        # 同一批记录共用一个时间戳；details 直接参与序列化，失败时才退回字符串
+        timestamp = datetime.now().isoformat()
+        lines = []
+        for entry in entries:
+            record = {
+                'timestamp': timestamp,
+                'project_id': project_id,
+                'file_path': entry.get('file_path'),
+                'debt_score': entry.get('debt_score', 0.0),
+                'severity': entry.get('severity') or 'low',
+            }
+            metadata_json = entry.get('metadata_json')
+            if metadata_json is not None:
+                # 已序列化的元数据作为 JSON 片段直接拼入，不再二次序列化
+                head = json.dumps(record, ensure_ascii=False)
+                lines.append(f'{head[:-1]}, "details": {metadata_json}}}')
+                continue
+            record['details'] = entry.get('metadata')
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False))
+            except (TypeError, ValueError):
+                record['details'] = str(record['details'])
+                lines.append(json.dumps(record, ensure_ascii=False))
+        _enqueue_scan_log(['\n'.join(lines) + '\n'])
     except Exception:
         logger.exception("Failed to write analysis scan log")
+
+
+# 扫描日志写入队列：元素为一次 _write_scan_log 产生的若干 JSON 行
+_SCAN_LOG_QUEUE: "queue.Queue[List[str]]" = queue.Queue()
+_SCAN_LOG_WRITER: Optional[threading.Thread] = None
+_SCAN_LOG_WRITER_PID: Optional[int] = None
+_SCAN_LOG_WRITER_LOCK = threading.Lock()
+_SCAN_LOG_STOP = object()
+
+
+def _enqueue_scan_log(lines: List[str]):
+    _ensure_scan_log_writer()
+    _SCAN_LOG_QUEUE.put(lines)
+
+
+def _ensure_scan_log_writer():
+    global _SCAN_LOG_WRITER, _SCAN_LOG_WRITER_PID
+    # Celery prefork 子进程不会继承父进程的线程，按 pid 判断是否需要在当前进程重新启动
+    pid = os.getpid()
+    if _SCAN_LOG_WRITER is not None and _SCAN_LOG_WRITER_PID == pid and _SCAN_LOG_WRITER.is_alive():
+        return
+    with _SCAN_LOG_WRITER_LOCK:
+        if _SCAN_LOG_WRITER is not None and _SCAN_LOG_WRITER_PID == pid and _SCAN_LOG_WRITER.is_alive():
+            return
+        writer = threading.Thread(target=_scan_log_writer_loop, name="scan-log-writer", daemon=True)
+        writer.start()
+        _SCAN_LOG_WRITER = writer
+        _SCAN_LOG_WRITER_PID = pid
+
+
+def _scan_log_writer_loop():
+    # 日志文件句柄由写线程独占并常开，每批只 write + flush，不再逐批 open/close
+    log_file = None
+    try:
+        while True:
+            batch = _drain_scan_log_queue([_SCAN_LOG_QUEUE.get()])
+            stop = any(lines is _SCAN_LOG_STOP for lines in batch)
+            try:
+                if log_file is None:
+                    log_file = _open_scan_log()
+                _write_scan_log_lines(log_file, [lines for lines in batch if lines is not _SCAN_LOG_STOP])
+            except Exception:
+                logger.exception("Failed to write analysis scan log")
+                # 丢弃出错的句柄，下一批重新打开
+                if log_file is not None:
+                    _close_quietly(log_file)
+                    log_file = None
+            if stop:
+                return
+    finally:
+        if log_file is not None:
+            _close_quietly(log_file)
+
+
+def _drain_scan_log_queue(batch: List[List[str]]) -> List[List[str]]:
+    # 取出当前已排队的全部记录，一次写完
+    try:
+        while True:
+            batch.append(_SCAN_LOG_QUEUE.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+
+def _open_scan_log():
+    return open(LOG_FILE_PATH, 'a', buffering=65536, encoding='utf-8')
+
+
+def _write_scan_log_lines(log_file, batch: List[List[str]]):
+    for lines in batch:
+        log_file.writelines(lines)
+    log_file.flush()
+    if settings.LOG_FSYNC:
+        os.fsync(log_file.fileno())
+
+
+def _close_quietly(log_file):
+    try:
+        log_file.close()
+    except Exception:
+        pass
+
+
+def _flush_scan_log():
+    """进程退出前把尚未写出的记录写入日志文件"""
+    writer = _SCAN_LOG_WRITER
+    if writer is not None and _SCAN_LOG_WRITER_PID == os.getpid() and writer.is_alive():
+        # 让写线程处理完已排队的记录后退出
+        _SCAN_LOG_QUEUE.put(_SCAN_LOG_STOP)
+        writer.join(timeout=5)
+        return
+    batch = _drain_scan_log_queue([])
+    if batch:
+        try:
+            with _open_scan_log() as log_file:
+                _write_scan_log_lines(log_file, batch)
+        except Exception:
+            logger.exception("Failed to write analysis scan log")
+
+
+atexit.register(_flush_scan_log)
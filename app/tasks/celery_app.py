@@ -2,6 +2,11 @@
 from celery import Celery
 from app.core.config import settings
 
+# 分析任务走独立队列，避免与其他任务互相阻塞；API 侧按名称投递，无需导入任务模块
+ANALYSIS_QUEUE = "analysis"
+ANALYZE_PROJECT_TASK = "app.tasks.analysis_tasks.analyze_project_task"
+SCAN_PROJECT_CURRENT_TASK = "app.tasks.analysis_tasks.scan_project_current_task"
+
 celery_app = Celery(
     "technical_debt_tasks",
     broker=settings.REDIS_URL,
@@ -15,4 +20,14 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    task_routes={
+        ANALYZE_PROJECT_TASK: {"queue": ANALYSIS_QUEUE},
+        SCAN_PROJECT_CURRENT_TASK: {"queue": ANALYSIS_QUEUE},
+    },
+    # 长任务：每个进程只预取一条，执行完才 ack，worker 崩溃时消息重新投递
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    worker_max_tasks_per_child=settings.CELERY_WORKER_MAX_TASKS_PER_CHILD,
+    worker_max_memory_per_child=settings.CELERY_WORKER_MAX_MEMORY_PER_CHILD,
 )
\ No newline at end of file
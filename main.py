@@ -1,9 +1,11 @@
 # main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 from app.core.config import settings
 from app.api.api import api_router
+from app.api.errors import register_exception_handlers
 from app.api.projects import project_router  # 添加导入
 from app.api.debts import debt_router        # 添加导入
 from app.tasks.analysis_tasks import _ensure_log_file  # 确保分析日志文件可用
@@ -23,6 +25,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 项目列表、债务列表等 JSON 响应体积较大，超过 1KB 时按客户端 Accept-Encoding 压缩
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# 服务层异常、Redis/broker 与数据库错误统一映射为 HTTP 响应
+register_exception_handlers(app)
+
 # 注册路由
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(project_router, prefix="/api/v1")  # 添加项目路由
@@ -32,8 +40,12 @@ app.include_router(debt_router, prefix="/api/v1")        # 添加债务路由
 async def startup_event():
     """应用启动事件"""
     # 创建数据库表
-    from app.core.database import engine, Base
+    from app.core.database import engine, Base, POOL_SIZE, MAX_OVERFLOW
     Base.metadata.create_all(bind=engine)
+    # 同步路由（Session 依赖）都在 AnyIO 线程池中执行：线程数不超过连接池容量，
+    # 多出的请求在事件循环中排队，而不是占着线程在 QueuePool 上等待直至超时
+    from anyio import to_thread
+    to_thread.current_default_thread_limiter().total_tokens = POOL_SIZE + MAX_OVERFLOW
     _ensure_log_file()
 
 if __name__ == "__main__":
@@ -1,33 +1,44 @@
+from sqlalchemy import select
+
 from app.core.config import settings
-from app.core.database import SessionLocal
-from app.repositories.project_repository import ProjectRepository
+from app.core.database import script_session
+from app.repositories.project_repository import _normalize_path
 from app.models.project import Project
+from app.models.debt import TechnicalDebt  # noqa: F401  注册 Project.debt_items 关系的目标模型
 import urllib.parse
 
 print('DATABASE_URL =', settings.DATABASE_URL)
-session = SessionLocal()
-try:
-    proj = session.query(Project).filter(Project.id==19).first()
-    if not proj:
+with script_session() as session:
+    # 只读两列，得到 Row 而非 ORM 实例
+    row = session.execute(select(Project.id, Project.local_path).where(Project.id == 19)).first()
+    if row is None:
         print('Project id 19 not found')
     else:
-        print('project.id=', proj.id)
-        print('project.local_path raw=', repr(getattr(proj, 'local_path', None)))
-        print('project.local_path (as stored) =', proj.local_path)
+        pid, lp = row
+        print('project.id=', pid)
+        print('project.local_path raw=', repr(lp))
+        print('project.local_path (as stored) =', lp)
 
-    decoded = urllib.parse.unquote('d:%5CProgramming+Files%5CJava%5CChatGIS-server')
+    decoded = urllib.parse.unquote_to_bytes('d:%5CProgramming+Files%5CJava%5CChatGIS-server').decode('utf-8')
     print('decoded query param =', decoded)
 
-    repo = ProjectRepository(Project, session)
-    r1 = repo.get_by_local_path(decoded)
-    print('repo.get_by_local_path(decoded) ->', getattr(r1, 'id', None))
     raw_q = r"d:\\Programming Files\\Java\\ChatGIS-server"
-    r2 = repo.get_by_local_path(raw_q)
-    print('repo.get_by_local_path(raw_q) ->', getattr(r2, 'id', None))
+    # 两种写法按与 get_by_local_path 相同的规则规范化后，一次 IN 查询取回
+    norms = {'decoded': _normalize_path(decoded), 'raw_q': _normalize_path(raw_q)}
+    found = dict(session.execute(
+        select(Project.local_path_norm, Project.id).where(Project.local_path_norm.in_(set(norms.values())))
+    ).all())
+    print('repo.get_by_local_path(decoded) ->', found.get(norms['decoded']))
+    print('repo.get_by_local_path(raw_q) ->', found.get(norms['raw_q']))
 
-    allp = session.query(Project).filter(Project.local_path!=None).limit(20).all()
+    # 分批从游标读取并边读边打印，不先整体物化
+    # 只取打印用到的两列，得到轻量 Row 而非完整的 Project 实例
+    sample = session.execute(
+        select(Project.id, Project.local_path)
+        .where(Project.local_path.is_not(None))
+        .limit(20)
+        .execution_options(yield_per=50)
+    )
     print('\nSample stored local_paths:')
-    for p in allp:
-        print(p.id, '->', repr(p.local_path))
-finally:
-    session.close()
+    for pid, lp in sample:
+        print(pid, '->', repr(lp))
@@ -0,0 +1,64 @@
+"""一次性迁移：为 technical_debts 表添加 file_path_normalized 列及 (project_id, file_path_normalized) 索引，
+并用与写入路径相同的规范化规则回填已有数据。
+
+用法：在项目根激活虚拟环境后运行：
+    python scripts/db_migrate_add_debt_normalized_path.py
+
+注意：规范化规则包含 os.path.normpath，无法用 SQL 表达，因此回填在 Python 中分批完成；
+新建的数据库由 Base.metadata.create_all 直接创建该列与索引，无需运行本脚本。请在生产前备份数据库。
+"""
+from sqlalchemy import text
+
+from app.core.database import script_engine
+from app.repositories.debt_repository import _normalize_path
+
+BATCH_SIZE = 1000
+
+
+def main():
+    engine = script_engine()
+
+    with engine.begin() as conn:
+        dialect = conn.dialect.name
+        print('DB dialect:', dialect)
+        if not dialect.startswith('postgres'):
+            print('This migration script currently supports Postgres only. Dialect:', dialect)
+            return
+        stmts = [
+            "ALTER TABLE technical_debts ADD COLUMN IF NOT EXISTS file_path_normalized varchar(500);",
+            "CREATE INDEX IF NOT EXISTS ix_debt_proj_norm ON technical_debts (project_id, file_path_normalized);",
+        ]
+        for s in stmts:
+            print('Executing:', s)
+            conn.execute(text(s))
+
+    backfilled = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, file_path FROM technical_debts "
+                    "WHERE file_path_normalized IS NULL AND id > :last_id ORDER BY id LIMIT :limit"
+                ),
+                {'last_id': last_id, 'limit': BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+            params = [
+                {'id': row.id, 'norm': _normalize_path(row.file_path or '')}
+                for row in rows
+            ]
+            conn.execute(
+                text("UPDATE technical_debts SET file_path_normalized = :norm WHERE id = :id"),
+                params,
+            )
+            last_id = rows[-1].id
+            backfilled += len(rows)
+            print('Backfilled rows:', backfilled)
+
+    print('Migration completed')
+
+
+if __name__ == '__main__':
+    main()
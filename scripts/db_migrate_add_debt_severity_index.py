@@ -0,0 +1,36 @@
+"""一次性迁移：为 technical_debts 表添加 (project_id, severity, status) 复合索引 ix_debt_project_severity，
+供债务摘要的分组统计与高危债务查询使用。
+
+用法：在项目根激活虚拟环境后运行：
+    python scripts/db_migrate_add_debt_severity_index.py
+
+注意：使用 CREATE INDEX CONCURRENTLY，建索引期间不阻塞写入；该语句不能在事务中执行，
+因此连接以 AUTOCOMMIT 模式运行。若中途失败会留下 INVALID 索引，需先 DROP INDEX 再重跑。
+新建的数据库由 Base.metadata.create_all 直接创建该索引，无需运行本脚本。
+"""
+from sqlalchemy import text
+
+from app.core.database import script_engine
+
+
+def main():
+    engine = script_engine(isolation_level='AUTOCOMMIT')
+
+    with engine.connect() as conn:
+        dialect = conn.dialect.name
+        print('DB dialect:', dialect)
+        if not dialect.startswith('postgres'):
+            print('This migration script currently supports Postgres only. Dialect:', dialect)
+            return
+        stmt = (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_debt_project_severity "
+            "ON technical_debts (project_id, severity, status);"
+        )
+        print('Executing:', stmt)
+        conn.execute(text(stmt))
+
+    print('Migration completed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""一次性迁移：为 projects 表添加 local_path_norm 列及唯一索引 uq_projects_local_path_norm，
+并用与写入路径相同的规范化规则回填已有数据。
+
+用法：在项目根激活虚拟环境后运行：
+    python scripts/db_migrate_add_project_normalized_path.py
+
+注意：规范化规则包含 os.path.normpath，无法用 SQL 表达，因此回填在 Python 中分批完成；
+若已有多个项目规范化后路径相同，唯一索引无法建立，脚本会列出冲突并改建普通索引，请人工合并后重跑。
+新建的数据库由 Base.metadata.create_all 直接创建该列与索引，无需运行本脚本。请在生产前备份数据库。
+"""
+from sqlalchemy import text
+
+from app.core.database import script_engine
+from app.repositories.project_repository import _normalize_path
+
+BATCH_SIZE = 1000
+
+
+def main():
+    engine = script_engine()
+
+    with engine.begin() as conn:
+        dialect = conn.dialect.name
+        print('DB dialect:', dialect)
+        if not dialect.startswith('postgres'):
+            print('This migration script currently supports Postgres only. Dialect:', dialect)
+            return
+        stmt = "ALTER TABLE projects ADD COLUMN IF NOT EXISTS local_path_norm varchar(500);"
+        print('Executing:', stmt)
+        conn.execute(text(stmt))
+
+    backfilled = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, local_path FROM projects "
+                    "WHERE local_path_norm IS NULL AND local_path IS NOT NULL AND id > :last_id ORDER BY id LIMIT :limit"
+                ),
+                {'last_id': last_id, 'limit': BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+            params = [
+                {'id': row.id, 'norm': _normalize_path(row.local_path)}
+                for row in rows
+            ]
+            conn.execute(
+                text("UPDATE projects SET local_path_norm = :norm WHERE id = :id"),
+                params,
+            )
+            last_id = rows[-1].id
+            backfilled += len(rows)
+            print('Backfilled rows:', backfilled)
+
+    with engine.begin() as conn:
+        duplicates = conn.execute(
+            text(
+                "SELECT local_path_norm, array_agg(id ORDER BY id) AS ids FROM projects "
+                "WHERE local_path_norm IS NOT NULL GROUP BY local_path_norm HAVING count(*) > 1"
+            )
+        ).all()
+        if duplicates:
+            for row in duplicates:
+                print('Duplicate normalized path:', row.local_path_norm, 'project ids:', row.ids)
+            stmt = "CREATE INDEX IF NOT EXISTS ix_projects_local_path_norm ON projects (local_path_norm);"
+        else:
+            stmt = "CREATE UNIQUE INDEX IF NOT EXISTS uq_projects_local_path_norm ON projects (local_path_norm);"
+        print('Executing:', stmt)
+        conn.execute(text(stmt))
+
+    print('Migration completed')
+
+
+if __name__ == '__main__':
+    main()
@@ -7,27 +7,46 @@ Usage:
 This script is safe to run multiple times; it uses IF EXISTS checks.
 Run it after taking a backup of your DB.
 """
-from sqlalchemy import create_engine, text
-from app.core.config import settings
+from sqlalchemy import bindparam, text
+from app.core.database import script_engine
+from app.models.project import Project
+
+LOCK_COLUMNS = ('locked_by', 'lock_expires_at')
 
 
 def main():
-    url = settings.DATABASE_URL
-    engine = create_engine(url)
-
-    with engine.connect() as conn:
-        dialect = conn.dialect.name
-        print('DB dialect:', dialect)
-        if dialect.startswith('postgres'):
-            stmts = [
-                "ALTER TABLE projects DROP COLUMN IF EXISTS locked_by;",
-                "ALTER TABLE projects DROP COLUMN IF EXISTS lock_expires_at;",
+    engine = script_engine()
+
+    try:
+        # 单个事务、单条 ALTER：只获取一次 projects 表锁，两列同时删除或都不删除
+        with engine.begin() as conn:
+            dialect = conn.dialect.name
+            print('DB dialect:', dialect)
+            if not dialect.startswith('postgres'):
+                print('This migration script currently supports Postgres only. Dialect:', dialect)
+                return
+            # 先读 information_schema：列都已删除时不再执行 ALTER，避免重复运行时也去拿表的排他锁
+            # 表名取自模型；两列已不在模型中，无法用 DropColumn(Column) 构造，仍拼 ALTER，标识符经方言转义
+            table = Project.__table__.name
+            existing = [
+                row[0] for row in conn.execute(
+                    text(
+                        "SELECT column_name FROM information_schema.columns "
+                        "WHERE table_schema = current_schema() AND table_name = :table "
+                        "AND column_name IN :columns ORDER BY column_name"
+                    ).bindparams(bindparam('columns', expanding=True)),
+                    {'table': table, 'columns': list(LOCK_COLUMNS)},
+                )
             ]
-            for s in stmts:
-                print('Executing:', s)
-                conn.execute(text(s))
-        else:
-            print('This migration script currently supports Postgres only. Dialect:', dialect)
+            if not existing:
+                print('Nothing to drop: lock columns already removed')
+                return
+            quote = conn.dialect.identifier_preparer.quote
+            stmt = f"ALTER TABLE {quote(table)} " + ", ".join(f"DROP COLUMN IF EXISTS {quote(name)}" for name in existing) + ";"
+            print('Executing:', stmt)
+            conn.execute(text(stmt))
+    finally:
+        engine.dispose()
 
     print('Migration completed')
 